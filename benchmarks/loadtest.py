@@ -0,0 +1,202 @@
+"""
+Load-test the app with concurrent simulated sessions.
+
+Each session is a thread that visits the pages in turn with Streamlit's
+AppTest, rerunning each as an interaction would. The sessions share this
+process's caches and DBManager, as a server's sessions do, so the numbers
+cover the module-level work, st.cache_* contention and the read pool:
+
+    python benchmarks/loadtest.py --sessions 20 --reruns 3 --size medium
+
+Reports reruns per second, latency percentiles per page, and peak RSS growth
+per session. Runs against a synthetic db (make_db.py) unless given --db.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from make_db import SIZES, make_db
+
+APP = Path(__file__).resolve().parents[1] / "lionel_app"
+PAGES = [
+    "About.py",
+    *sorted(p.relative_to(APP).as_posix() for p in APP.glob("pages/*.py")),
+]
+PERCENTILES = (50, 90, 95, 99)
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def shared_runtime():
+    """
+    AppTest sets the global Runtime for each run and unsets it when the run
+    ends, which breaks any other session still running. Fall back to one
+    shared (mock, like AppTest's) Runtime while it's unset.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import (
+        MemoryCacheStorageManager,
+    )
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    with mock.patch.object(
+        Runtime, "instance", classmethod(lambda cls: cls._instance or runtime)
+    ), mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)):
+        yield
+
+
+def session(index, args, latencies, errors):
+    """Visit each page (starting at a different one per session) and rerun it."""
+    from streamlit.testing.v1 import AppTest
+
+    for k in range(len(args.pages)):
+        page = args.pages[(index + k) % len(args.pages)]
+        at = AppTest.from_file(str(APP / page), default_timeout=args.timeout)
+        for _ in range(1 + args.reruns):
+            start = time.perf_counter()
+            try:
+                at.run()
+            except Exception as e:  # e.g. a timeout
+                errors[page].append(repr(e))
+                break
+            latencies[page].append(time.perf_counter() - start)
+            errors[page] += [str(e.message) for e in at.exception]
+            time.sleep(args.think)
+
+
+def load_test(args):
+    sys.path.insert(0, str(APP))
+    import streamlit.logger
+
+    # st.cache_* warns on every call outside `streamlit run`; the env var is
+    # for when AppTest loads the config, which sets the level again
+    streamlit.logger.set_log_level("error")
+    os.environ["STREAMLIT_LOGGER_LEVEL"] = "error"
+    from diagnostics import loader_hit_rates
+    from profiling import timings
+
+    latencies = defaultdict(list)
+    errors = defaultdict(list)
+    rss_before = peak_rss_mib()
+    threads = [
+        threading.Thread(target=session, args=(i, args, latencies, errors))
+        for i in range(args.sessions)
+    ]
+    with shared_runtime():
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    rss_after = peak_rss_mib()
+
+    pages = {}
+    for page in args.pages:
+        ms = np.array(latencies[page]) * 1000
+        pages[page] = {
+            "reruns": len(ms),
+            "errors": len(errors[page]),
+            "mean_ms": ms.mean() if len(ms) else None,
+            **{
+                f"p{q}_ms": np.percentile(ms, q) if len(ms) else None
+                for q in PERCENTILES
+            },
+        }
+    reruns = sum(len(v) for v in latencies.values())
+    return {
+        "sessions": args.sessions,
+        "reruns": reruns,
+        "errors": {page: errs for page, errs in errors.items() if errs},
+        "seconds": elapsed,
+        "reruns_per_second": reruns / elapsed,
+        "peak_rss_mib": rss_after,
+        "rss_growth_per_session_mib": (rss_after - rss_before) / args.sessions,
+        "pages": pages,
+        "loader_hit_rates": loader_hit_rates(timings.summary()),
+    }
+
+
+def report(results):
+    lines = [
+        f"{results['sessions']} sessions, {results['reruns']} reruns in "
+        f"{results['seconds']:.1f}s: {results['reruns_per_second']:.1f} reruns/s",
+        f"Peak RSS {results['peak_rss_mib']:.0f} MiB, "
+        f"{results['rss_growth_per_session_mib']:.2f} MiB growth per session",
+        "",
+        f"{'page':<32}{'reruns':>8}{'errors':>8}{'mean ms':>10}"
+        + "".join(f"{f'p{q} ms':>10}" for q in PERCENTILES),
+    ]
+    for page, stat in results["pages"].items():
+        if not stat["reruns"]:
+            lines.append(f"{page:<32}{0:>8}{stat['errors']:>8}")
+            continue
+        lines.append(
+            f"{page:<32}{stat['reruns']:>8}{stat['errors']:>8}{stat['mean_ms']:>10.0f}"
+            + "".join(f"{stat[f'p{q}_ms']:>10.0f}" for q in PERCENTILES)
+        )
+    lines += ["", "Loader cache hit rates:"]
+    lines += [
+        f"  {loader:<30}{rate:>6.0%}"
+        for loader, rate in results["loader_hit_rates"].items()
+    ]
+    for page, errs in results["errors"].items():
+        lines.append(f"{page}: {len(errs)} errors, e.g. {errs[0]}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument(
+        "--reruns", type=int, default=2, help="reruns per page after its first run"
+    )
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES)
+    parser.add_argument(
+        "--think", type=float, default=0, help="seconds between a session's reruns"
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="seconds per rerun")
+    parser.add_argument("--db", help="an existing db to run against")
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--output", help="write the results to this .json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="lionel-loadtest-") as workdir:
+        if args.db:
+            db = Path(args.db).resolve()
+        else:
+            db = Path(workdir) / "lionel.db"
+            make_db(db, **SIZES[args.size])
+        # Read by About when the first page imports it
+        os.environ["LIONEL_DB"] = str(db)
+        results = load_test(args)
+
+    print(report(results))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, default=float))
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Build a synthetic lionel.db for benchmarking.
+
+The tables have the columns the app reads; scoreline draws follow the schema
+of data/city_arsenal.csv. Sizes are set per preset or overridden:
+
+    python benchmarks/make_db.py /tmp/lionel.db --size medium --players 5000
+"""
+
+import argparse
+import datetime as dt
+import sqlite3
+
+import numpy as np
+
+SEASON = 25
+N_GAMEWEEKS = 38
+POSITIONS = np.array(["GK", "DEF", "MID", "FWD"])
+# The squad and starting XI the optimiser picks, per position
+SQUAD = {"GK": (2, 1), "DEF": (5, 4), "MID": (5, 4), "FWD": (3, 2)}
+
+SIZES = {
+    "small": dict(fixtures=10, players=600, chains=4, draws=1_000, runs=3),
+    "medium": dict(fixtures=10, players=2_000, chains=4, draws=5_000, runs=3),
+    "large": dict(fixtures=10, players=10_000, chains=8, draws=12_500, runs=3),
+}
+
+SCHEMA = """
+CREATE TABLE teams (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE fixtures (
+    id INTEGER PRIMARY KEY, season INTEGER, gameweek INTEGER,
+    home_id INTEGER, away_id INTEGER, kickoff_time TEXT
+);
+CREATE TABLE scorelines (
+    id INTEGER PRIMARY KEY, match INTEGER, home_goals INTEGER, away_goals INTEGER,
+    chain INTEGER, draw INTEGER, home TEXT, away TEXT, season INTEGER
+);
+CREATE TABLE selections (
+    id INTEGER PRIMARY KEY, player TEXT, team_name TEXT, position TEXT, value REAL,
+    mean_points_pred REAL, xv INTEGER, xi INTEGER, gameweek INTEGER,
+    season INTEGER, created_at TEXT
+);
+CREATE TABLE player_inference (
+    id INTEGER PRIMARY KEY, player_name TEXT, position TEXT, team_name TEXT,
+    mean_minutes REAL, goals_scored REAL, assists REAL, season INTEGER,
+    created_at TEXT
+);
+CREATE TABLE team_inference (
+    id INTEGER PRIMARY KEY, team_name TEXT, attack REAL, defence REAL,
+    season INTEGER, created_at TEXT
+);
+"""
+
+
+def make_db(path, fixtures, players, chains, draws, runs, seed=0):
+    """
+    Write a db with `fixtures` matches per gameweek, `players` players in each
+    model run, and `chains` x `draws` scoreline draws per match of the next
+    gameweek. Returns the next gameweek.
+    """
+    rng = np.random.default_rng(seed)
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+
+    teams = [f"Team {i}" for i in range(2 * fixtures)]
+    con.executemany("INSERT INTO teams VALUES (?, ?)", list(enumerate(teams, 1)))
+
+    # Weekly gameweeks, a third of the way through the season as of today
+    start = dt.datetime.combine(dt.date.today(), dt.time(12)) - dt.timedelta(
+        weeks=N_GAMEWEEKS // 3
+    )
+    rows = []
+    for gameweek in range(1, N_GAMEWEEKS + 1):
+        order = rng.permutation(len(teams)) + 1
+        kickoff = start + dt.timedelta(weeks=gameweek - 1)
+        for k in range(fixtures):
+            rows.append(
+                (
+                    SEASON,
+                    gameweek,
+                    int(order[2 * k]),
+                    int(order[2 * k + 1]),
+                    (kickoff + dt.timedelta(hours=k)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                )
+            )
+    con.executemany(
+        "INSERT INTO fixtures (season, gameweek, home_id, away_id, kickoff_time) "
+        "VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    next_gw = N_GAMEWEEKS // 3 + 1
+
+    # The app reads the home team from away_id (and vice versa); match that
+    matches = con.execute(
+        """
+        SELECT fixtures.id, home.name, away.name
+        FROM fixtures
+        JOIN teams AS home ON fixtures.away_id = home.id
+        JOIN teams AS away ON fixtures.home_id = away.id
+        WHERE season = ? AND gameweek = ?
+        """,
+        (SEASON, next_gw),
+    ).fetchall()
+    n = chains * draws
+    chain, draw = np.divmod(np.arange(n), draws)
+    for match, home, away in matches:
+        home_goals = rng.poisson(rng.uniform(0.8, 2.2), n)
+        away_goals = rng.poisson(rng.uniform(0.6, 1.8), n)
+        con.executemany(
+            "INSERT INTO scorelines "
+            "(match, home_goals, away_goals, chain, draw, home, away, season) "
+            f"VALUES ({match}, ?, ?, ?, ?, '{home}', '{away}', {SEASON})",
+            zip(
+                home_goals.tolist(), away_goals.tolist(), chain.tolist(), draw.tolist()
+            ),
+        )
+
+    ids = np.arange(players)
+    position = POSITIONS[ids % 4]
+    team = np.array(teams)[ids % len(teams)]
+    for run in range(runs):
+        created_at = f"2025-01-{run + 1:02d} 12:00:00"
+        points = rng.gamma(2, 1.5, players).round(3)
+        xv = np.zeros(players, dtype=int)
+        xi = np.zeros(players, dtype=int)
+        for pos, (n_squad, n_xi) in SQUAD.items():
+            best = np.flatnonzero(position == pos)
+            best = best[np.argsort(-points[best])][:n_squad]
+            xv[best] = 1
+            xi[best[:n_xi]] = 1
+        con.executemany(
+            "INSERT INTO selections (player, team_name, position, value, "
+            "mean_points_pred, xv, xi, gameweek, season, created_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, {next_gw}, {SEASON}, '{created_at}')",
+            zip(
+                [f"{i}_First{i} Last{i}" for i in ids],
+                team.tolist(),
+                position.tolist(),
+                rng.integers(40, 130, players).tolist(),
+                points.tolist(),
+                xv.tolist(),
+                xi.tolist(),
+            ),
+        )
+        con.executemany(
+            "INSERT INTO player_inference (player_name, position, team_name, "
+            "mean_minutes, goals_scored, assists, season, created_at) "
+            f"VALUES (?, ?, ?, ?, ?, ?, {SEASON}, '{created_at}')",
+            zip(
+                [f"First{i} Last{i}" for i in ids],
+                position.tolist(),
+                team.tolist(),
+                rng.uniform(0, 90, players).tolist(),
+                rng.beta(1, 6, players).tolist(),
+                rng.beta(1, 8, players).tolist(),
+            ),
+        )
+        con.executemany(
+            "INSERT INTO team_inference (team_name, attack, defence, season, created_at) "
+            f"VALUES (?, ?, ?, {SEASON}, '{created_at}')",
+            [(t, rng.normal(0, 0.2), rng.normal(0, 0.2)) for t in teams],
+        )
+    con.commit()
+    con.close()
+    return next_gw
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("path")
+    parser.add_argument("--size", choices=SIZES, default="small")
+    for arg in SIZES["small"]:
+        parser.add_argument(f"--{arg}", type=int, help="overrides the size's")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = {k: getattr(args, k) or v for k, v in SIZES[args.size].items()}
+    next_gw = make_db(args.path, seed=args.seed, **sizes)
+    print(f"Wrote {args.path} ({sizes}); next gameweek {next_gw}")
+
+
+if __name__ == "__main__":
+    main()
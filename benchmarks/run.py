@@ -0,0 +1,258 @@
+"""
+Benchmark the app's loaders and figure builders on synthetic dbs.
+
+For each size, builds a db with make_db.py and times every benchmark in a
+fresh process (so each size gets its own DBManager, via LIONEL_DB). "raw"
+reads straight from the tables; "precomputed" runs precompute.py's pass first,
+so the loaders read its snapshots and summaries. Reports the median and best
+wall time, the tracemalloc peak and, for figures, the JSON size:
+
+    python benchmarks/run.py --sizes small medium --output before.json
+    python benchmarks/run.py --sizes small medium --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from make_db import SIZES, make_db
+
+APP = Path(__file__).resolve().parents[1] / "lionel_app"
+MODES = ("raw", "precomputed")
+# The Inference page's default minimum average minutes
+MIN_MINUTES = 45
+
+
+def benchmarks():
+    """(name, setup, call) for each benchmark. setup clears any caches."""
+    import loaders
+    import utils
+    from About import dbm
+    from plot_players import build_player_inf_plot
+    from plot_team import (
+        build_scoreline_plot,
+        build_team_inf_plot,
+        create_plot,
+        create_value_plot,
+    )
+
+    def clear(loader):
+        # Past the timing wrapper to the st.cache_* function
+        return loader.__wrapped__.clear
+
+    gameweek = utils.get_gameweek(dbm)
+    version = dbm.data_version()
+    home, away = loaders.get_next_matches(gameweek, version)[0].split(" vs ")
+    sel = dbm.latest_run("selections", gameweek)
+    df_sel = loaders.get_df_sel(gameweek, sel)
+    df_player_inf = loaders.get_df_player_inf(dbm.latest_run("player_inference"))
+    df_team_inf = loaders.get_df_team_inf(dbm.latest_run("team_inference"))
+    matrix = loaders.get_scoreline_matrix(home, away, gameweek, version)
+
+    return [
+        ("get_gameweek", utils._gameweeks.clear, lambda: utils.get_gameweek(dbm)),
+        (
+            "get_next_matches",
+            clear(loaders.get_next_matches),
+            lambda: loaders.get_next_matches(gameweek, version),
+        ),
+        (
+            "get_df_sel",
+            clear(loaders.get_df_sel),
+            lambda: loaders.get_df_sel(gameweek, sel),
+        ),
+        (
+            "get_df_player_inf",
+            clear(loaders.get_df_player_inf),
+            lambda: loaders.get_df_player_inf(dbm.latest_run("player_inference")),
+        ),
+        (
+            "get_df_team_inf",
+            clear(loaders.get_df_team_inf),
+            lambda: loaders.get_df_team_inf(dbm.latest_run("team_inference")),
+        ),
+        ("get_match_draws", None, lambda: loaders.get_match_draws(home, away)),
+        (
+            "get_scoreline_matrix",
+            clear(loaders.get_scoreline_matrix),
+            lambda: loaders.get_scoreline_matrix(home, away, gameweek, version),
+        ),
+        (
+            "get_gameweek_outcomes",
+            clear(loaders.get_gameweek_outcomes),
+            lambda: loaders.get_gameweek_outcomes(gameweek, version),
+        ),
+        ("create_plot", None, lambda: create_plot(df_sel)),
+        ("create_value_plot", None, lambda: create_value_plot(df_sel)),
+        (
+            "build_player_inf_plot",
+            None,
+            lambda: build_player_inf_plot(df_player_inf, MIN_MINUTES),
+        ),
+        ("build_team_inf_plot", None, lambda: build_team_inf_plot(df_team_inf)),
+        (
+            "build_scoreline_plot",
+            None,
+            lambda: build_scoreline_plot(matrix, home, away),
+        ),
+    ]
+
+
+def measure(setup, call, repeat):
+    """Wall times of `repeat` calls, then the tracemalloc peak of one more."""
+    seconds = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = call()
+        seconds.append(time.perf_counter() - start)
+
+    # Separately, as tracing slows the calls down
+    if setup:
+        setup()
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Figures only: what st.plotly_chart serialises and sends to the browser
+    json_bytes = len(result.to_json()) if hasattr(result, "to_plotly_json") else None
+    return {
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": min(seconds) * 1000,
+        "peak_kib": peak / 1024,
+        "json_kib": json_bytes / 1024 if json_bytes is not None else None,
+    }
+
+
+def child(args):
+    """Run the benchmarks against LIONEL_DB, writing the results to args.child."""
+    sys.path.insert(0, str(APP))
+    import streamlit.logger
+
+    # st.cache_* warns on every call outside `streamlit run`
+    streamlit.logger.set_log_level("error")
+    if args.mode == "precomputed":
+        import loaders
+        from About import dbm
+        from precompute import precompute
+
+        precompute(dbm, loaders)
+
+    results = []
+    for name, setup, call in benchmarks():
+        if args.only and name not in args.only:
+            continue
+        results.append({"benchmark": name, **measure(setup, call, args.repeat)})
+    Path(args.child).write_text(json.dumps(results))
+
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="lionel-bench-") as workdir:
+        for size in args.sizes:
+            db = Path(workdir) / size / "lionel.db"
+            db.parent.mkdir()
+            started = time.perf_counter()
+            make_db(db, seed=args.seed, **SIZES[size])
+            print(f"{size}: built {db} in {time.perf_counter() - started:.1f}s")
+
+            for mode in args.modes:
+                out = Path(workdir) / f"{size}-{mode}.json"
+                command = [
+                    sys.executable,
+                    __file__,
+                    "--child",
+                    str(out),
+                    "--mode",
+                    mode,
+                    "--repeat",
+                    str(args.repeat),
+                ]
+                if args.only:
+                    command += ["--only", *args.only]
+                subprocess.run(
+                    command,
+                    env=dict(os.environ, LIONEL_DB=str(db)),
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                )
+                results += [
+                    {"size": size, "mode": mode, **row}
+                    for row in json.loads(out.read_text())
+                ]
+    return results
+
+
+def report(results, baseline=None):
+    """A plain-text table, with the change in median time against `baseline`."""
+    previous = {
+        (r["size"], r["mode"], r["benchmark"]): r["median_ms"]
+        for r in (baseline or {}).get("results", [])
+    }
+    header = f"{'size':<8}{'mode':<13}{'benchmark':<24}{'median ms':>11}{'min ms':>10}{'peak KiB':>11}{'JSON KiB':>10}"
+    if baseline:
+        header += f"{'vs base':>9}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        line = (
+            f"{r['size']:<8}{r['mode']:<13}{r['benchmark']:<24}"
+            f"{r['median_ms']:>11.2f}{r['min_ms']:>10.2f}{r['peak_kib']:>11.0f}"
+            + (f"{r['json_kib']:>10.1f}" if r["json_kib"] is not None else f"{'':>10}")
+        )
+        before = previous.get((r["size"], r["mode"], r["benchmark"]))
+        if before:
+            line += f"{r['median_ms'] / before:>8.2f}x"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small"])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--only", nargs="+", help="run just these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this .json or .csv")
+    parser.add_argument("--compare", help="a previous --output .json to compare with")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    results = run(args)
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print(report(results, baseline))
+
+    if args.output:
+        output = Path(args.output)
+        if output.suffix == ".csv":
+            import pandas as pd
+
+            pd.DataFrame(results).to_csv(output, index=False)
+        else:
+            meta = {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "sizes": {size: SIZES[size] for size in args.sizes},
+            }
+            output.write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+        print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
+import os
 from pathlib import Path
 
+import diagnostics
 import pandas as pd
 import plotly
 import streamlit as st
 from connector import DBManager
+from figure_cache import figure_cache
 from plot_team import build_scoreline_plot
+from profiling import profile_page
+from scorelines import scoreline_matrix
 from utils import get_gameweek, setup_logger
 
 # GLOBALS TO BE IMPORTED ELSEWHERE
@@ -19,16 +24,34 @@ if "Users/toby/" in str(DATA):
 else:
     p = DATA
 
-logger.debug("DB: {}".format(p / "lionel.db"))
-dbm = DBManager(p / "lionel.db")
-NEXT_GW = get_gameweek(dbm)
-# NEXT_GW = 5
-logger.debug(f"Next gameweek: {NEXT_GW}")
 
+@st.cache_resource
+def get_dbm(db_path):
+    # One DBManager (engines, pools and reflected tables) per process, shared
+    # by every session and kept across reruns
+    logger.debug("DB: {}".format(db_path))
+    dbm = DBManager(db_path)
+    dbm.ensure_indexes()
+    dbm.ensure_runs()
+    return dbm
 
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
+
+# LIONEL_DB points the app (and precompute.py) at another db
+dbm = get_dbm(Path(os.environ.get("LIONEL_DB", p / "lionel.db")))
+# Figures published by precompute.py
+figure_cache.directory = dbm.db_path.parent / "figures"
+
+
+def get_next_gw():
+    # Resolved on use rather than at import; pages that don't need it never pay
+    return get_gameweek(dbm)
+
+
+# Shipped with the app, so never stale
+@st.cache_data(show_spinner="Pulling data...")
 def get_ars_city():
-    return pd.read_csv(DATA / "city_arsenal.csv")
+    df = pd.read_csv(DATA / "city_arsenal.csv")
+    return scoreline_matrix(df["home_goals"], df["away_goals"])
 
 
 def body_model():
@@ -145,7 +168,14 @@ def body_model():
     )
 
     st.write("**Man City v Arsenal: Posterior Predictive Distribution of Scorelines**")
-    st.plotly_chart(build_scoreline_plot(get_ars_city(), "Manchester City", "Arsenal"))
+    st.plotly_chart(
+        figure_cache.get(
+            "about_scoreline",
+            None,
+            (),
+            lambda: build_scoreline_plot(get_ars_city(), "Manchester City", "Arsenal"),
+        )
+    )
 
     # st.write("**Posterior Predictive Distribution of FPL Points**")
     st.write(
@@ -189,6 +219,11 @@ if __name__ == "__main__":
     st.set_page_config(
         page_title="lionel - About",
     )
-    body_model()
-    body_optimisation()
-    body_notes()
+    # Hidden diagnostics view: /?diagnostics
+    if "diagnostics" in st.query_params:
+        diagnostics.render()
+        st.stop()
+    with profile_page("About"):
+        body_model()
+        body_optimisation()
+        body_notes()
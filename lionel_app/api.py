@@ -0,0 +1,322 @@
+"""
+A read-only JSON API over lionel.db, for bots, spreadsheets and scripts.
+
+    python lionel_app/api.py [--db data/lionel.db] [--host 127.0.0.1] [--port 8000]
+
+    GET /runs                              the latest run of each table
+    GET /selections?gameweek=&position=&team_name=&xv=&xi=
+    GET /player-inference?position=&team_name=
+    GET /team-inference
+    GET /scorelines?gameweek=              outcome probabilities per fixture
+    GET /scorelines/{home}/{away}?gameweek=   joint scoreline counts
+
+Lists take `limit` (at most MAX_LIMIT) and `offset`, and come back as
+{"version", "total", "limit", "offset", "next", "data"}. Every response has
+an ETag from the run (or, for scorelines, the summaries' version) it was read from;
+send it back as If-None-Match to get a 304 until there's a new run.
+Responses are gzipped for clients that accept it.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+import uvicorn
+from connector import DBManager
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from sqlalchemy import text
+from utils import get_gameweek, setup_logger
+
+logger = setup_logger(__name__)
+
+DATA = Path(__file__).parents[1] / "data"
+SEASON = 25
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Rows encoded per chunk of a streamed response
+CHUNK_ROWS = 200
+# Clients and caches may keep responses, but must revalidate them
+CACHE_CONTROL = "no-cache"
+
+
+def etag(*parts):
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:20] + '"'
+
+
+def not_modified(request, tag):
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    # A list of tags, possibly weakened (W/) by a proxy that gzipped the response
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or tag in tags
+
+
+def int_param(request, name, default=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(400, f"{name} must be an integer")
+
+
+def paging(request):
+    limit = int_param(request, "limit", DEFAULT_LIMIT)
+    offset = int_param(request, "offset", 0)
+    if not 0 < limit <= MAX_LIMIT or offset < 0:
+        raise HTTPException(400, f"limit must be 1-{MAX_LIMIT}, and offset >= 0")
+    return limit, offset
+
+
+def equal_filters(request, columns):
+    """WHERE clauses and params for the query params that name `columns`."""
+    where, params = [], {}
+    for column in columns:
+        if column in request.query_params:
+            where.append(f"{column} = :{column}")
+            params[column] = request.query_params[column]
+    return where, params
+
+
+def stream_json(meta, columns, rows):
+    """`meta` with the rows as its "data", encoded a chunk of rows at a time."""
+    yield json.dumps(meta, default=str)[:-1] + ', "data": ['
+    for i in range(0, len(rows), CHUNK_ROWS):
+        chunk = [dict(zip(columns, row)) for row in rows[i : i + CHUNK_ROWS]]
+        yield ("," if i else "") + json.dumps(chunk, default=str)[1:-1]
+    yield "]}"
+
+
+def fetch_page(dbm, table, where, params, order_by, limit, offset):
+    """(columns, rows, total) for one page of a table, on one connection."""
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    with dbm.read_engine.connect() as conn:
+        total = conn.execute(
+            text(f"SELECT COUNT(*) FROM {table} {where_sql}"), params
+        ).scalar()
+        result = conn.execute(
+            text(
+                f"""
+                SELECT * FROM {table} {where_sql}
+                ORDER BY {order_by}
+                LIMIT :limit OFFSET :offset
+                """
+            ),
+            {**params, "limit": limit, "offset": offset},
+        )
+        return list(result.keys()), result.all(), total
+
+
+async def respond_page(request, version, table, where, params, order_by):
+    """One page of `table` as of `version`, or a 304 if the client has it."""
+    tag = etag(request.url.path, sorted(request.query_params.multi_items()), version)
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if not_modified(request, tag):
+        return Response(status_code=304, headers=headers)
+
+    limit, offset = paging(request)
+    # Read the page in full (a connection is only held for the query), then
+    # stream its encoding so large pages start sending straight away
+    columns, rows, total = await run_in_threadpool(
+        fetch_page,
+        request.app.state.dbm,
+        table,
+        where,
+        params,
+        order_by,
+        limit,
+        offset,
+    )
+    next_url = None
+    if offset + limit < total:
+        # request.url's path is unquoted, e.g. the team names in /scorelines
+        next_url = str(
+            request.url.replace(path=quote(request.url.path)).include_query_params(
+                offset=offset + limit
+            )
+        )
+    meta = {
+        "version": version,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next": next_url,
+    }
+    return StreamingResponse(
+        stream_json(meta, columns, rows),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+async def latest_run(request, table_name, gameweek=0):
+    created_at = await run_in_threadpool(
+        request.app.state.dbm.latest_run, table_name, gameweek
+    )
+    if created_at is None:
+        raise HTTPException(404, f"No runs have been loaded into {table_name}")
+    return created_at
+
+
+async def gameweek_param(request):
+    gameweek = int_param(request, "gameweek")
+    if gameweek is None:
+        gameweek = await run_in_threadpool(get_gameweek, request.app.state.dbm, SEASON)
+    return gameweek
+
+
+async def require_table(request, table_name, message):
+    # Checking for a table inspects the db, so it's a query like any other
+    tables = request.app.state.dbm.tables
+    if not await run_in_threadpool(tables.__contains__, table_name):
+        raise HTTPException(404, message)
+
+
+async def summaries_version(request, table_name):
+    await require_table(
+        request,
+        table_name,
+        "The scorelines haven't been summarised yet (see precompute.py)",
+    )
+    # Summaries don't record a run; their sources are written along with them
+    dbm = request.app.state.dbm
+    return await run_in_threadpool(dbm.data_version, "scoreline_sources")
+
+
+async def runs(request):
+    dbm = request.app.state.dbm
+    await require_table(
+        request, "runs", "The db has no runs registry yet (start the app)"
+    )
+    rows = await run_in_threadpool(
+        dbm.query, "SELECT table_name, gameweek, created_at FROM runs ORDER BY 1, 2"
+    )
+    data = [dict(row._mapping) for row in rows]
+    tag = etag(request.url.path, data)
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if not_modified(request, tag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"data": data}, headers=headers)
+
+
+async def selections(request):
+    gameweek = await gameweek_param(request)
+    created_at = await latest_run(request, "selections", gameweek)
+    where, params = equal_filters(request, ["position", "team_name", "xv", "xi"])
+    where += ["gameweek = :gameweek", "created_at = :created_at"]
+    params |= {"gameweek": gameweek, "created_at": created_at}
+    return await respond_page(
+        request,
+        created_at,
+        "selections",
+        where,
+        params,
+        "mean_points_pred DESC, rowid",
+    )
+
+
+async def player_inference(request):
+    created_at = await latest_run(request, "player_inference")
+    where, params = equal_filters(request, ["position", "team_name"])
+    where.append("created_at = :created_at")
+    params["created_at"] = created_at
+    return await respond_page(
+        request, created_at, "player_inference", where, params, "rowid"
+    )
+
+
+async def team_inference(request):
+    created_at = await latest_run(request, "team_inference")
+    return await respond_page(
+        request,
+        created_at,
+        "team_inference",
+        ["created_at = :created_at"],
+        {"created_at": created_at},
+        "team_name",
+    )
+
+
+async def scoreline_outcomes(request):
+    gameweek = await gameweek_param(request)
+    version = await summaries_version(request, "scoreline_outcomes")
+    return await respond_page(
+        request,
+        version,
+        "scoreline_outcomes",
+        ["season = :season", "gameweek = :gameweek"],
+        {"season": SEASON, "gameweek": gameweek},
+        "match, home",
+    )
+
+
+async def scoreline_counts(request):
+    gameweek = await gameweek_param(request)
+    version = await summaries_version(request, "scoreline_counts")
+    return await respond_page(
+        request,
+        version,
+        "scoreline_counts",
+        [
+            "season = :season",
+            "gameweek = :gameweek",
+            "home = :home",
+            "away = :away",
+        ],
+        {"season": SEASON, "gameweek": gameweek, **request.path_params},
+        "home_goals, away_goals",
+    )
+
+
+async def http_error(request, exc):
+    return JSONResponse(
+        {"error": exc.detail}, status_code=exc.status_code, headers=exc.headers
+    )
+
+
+def create_app(db_path):
+    app = Starlette(
+        routes=[
+            Route("/runs", runs),
+            Route("/selections", selections),
+            Route("/player-inference", player_inference),
+            Route("/team-inference", team_inference),
+            Route("/scorelines", scoreline_outcomes),
+            Route("/scorelines/{home}/{away}", scoreline_counts),
+        ],
+        middleware=[Middleware(GZipMiddleware, minimum_size=1024)],
+        exception_handlers={HTTPException: http_error},
+    )
+    # Only the read engine is used; the app and precompute.py do the writing
+    app.state.dbm = DBManager(db_path)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the latest model outputs as a JSON API."
+    )
+    parser.add_argument("--db", help="path to lionel.db (default: the app's)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # LIONEL_DB, as for the app
+    db_path = Path(args.db or os.environ.get("LIONEL_DB", DATA / "lionel.db"))
+    logger.info(f"Serving {db_path} on http://{args.host}:{args.port}")
+    uvicorn.run(create_app(db_path.resolve()), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,183 @@
+import itertools
+import json
+import os
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import sqlalchemy as sa
 from sqlalchemy import (
+    bindparam,
     create_engine,
+    event,
     text,
 )
+from profiling import timed
+from utils import READ_POOL_SIZE, setup_logger
+
+logger = setup_logger(__name__)
+
+BULK_CHUNK_SIZE = 50_000
+
+# Model outputs published as Arrow files, with the columns that partition the
+# "latest created_at" snapshot. scorelines has no created_at; it only ever
+# holds the latest run.
+SNAPSHOT_TABLES = {
+    "scorelines": None,
+    "selections": ("gameweek",),
+    "player_inference": (),
+    "team_inference": (),
+}
+# The columns each snapshot is looked up by. Its rows are sorted on them, so a
+# lookup is a slice of the memory-mapped file rather than a copy
+SNAPSHOT_KEYS = {
+    "scorelines": ("home", "away"),
+    "selections": ("gameweek",),
+}
+
+# Indexes the page queries rely on: name -> (table, columns)
+INDEXES = {
+    "ix_fixtures_season_gameweek_kickoff": (
+        "fixtures",
+        ("season", "gameweek", "kickoff_time"),
+    ),
+    "ix_selections_gameweek_created_at": ("selections", ("gameweek", "created_at")),
+    "ix_player_inference_created_at": ("player_inference", ("created_at",)),
+    "ix_team_inference_created_at": ("team_inference", ("created_at",)),
+    "ix_player_predictions_name_season_gameweek": (
+        "player_predictions",
+        ("name", "season", "gameweek"),
+    ),
+    "ix_player_predictions_season_gameweek": (
+        "player_predictions",
+        ("season", "gameweek"),
+    ),
+}
+
+# Tables whose latest created_at is registered in `runs`, and the column the
+# runs are split by (gameweek 0 in `runs` if they aren't)
+RUN_TABLES = {
+    "selections": "gameweek",
+    "player_inference": None,
+    "team_inference": None,
+}
+
+# Tables the pages read besides the run tables. Writes to them are counted in
+# `table_versions`, so data_version() changes with their data and nothing else
+VERSIONED_TABLES = (
+    "teams",
+    "fixtures",
+    "scorelines",
+    "scoreline_sources",
+    "player_predictions",
+    "model_metrics",
+)
+# Counted by DBManager's loads only: a per-row trigger doubles the time of a
+# load as big as a run's draws
+UNTRIGGERED_TABLES = ("scorelines",)
+WRITE_EVENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+class _Tables(Mapping):
+    """
+    DBManager.tables: Table objects keyed by name, each reflected from the db
+    the first time it is used rather than all at once on startup.
+    """
+
+    def __init__(self, metadata, engine):
+        self._metadata = metadata
+        self._engine = engine
+        self._lock = threading.Lock()
+
+    def _names(self):
+        return sa.inspect(self._engine).get_table_names()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._metadata.tables:
+                try:
+                    sa.Table(name, self._metadata, autoload_with=self._engine)
+                except sa.exc.NoSuchTableError:
+                    raise KeyError(name) from None
+        return self._metadata.tables[name]
+
+    def __contains__(self, name):
+        return name in self._metadata.tables or name in self._names()
+
+    def __iter__(self):
+        return iter(self._names())
+
+    def __len__(self):
+        return len(self._names())
+
+
+def _configure_writer(engine):
+    # WAL lets the pages keep reading the previous state while a model run is
+    # loaded, and synchronous=NORMAL is durable enough under WAL. pysqlite's own
+    # transaction handling is switched off so that each transaction is an
+    # explicit BEGIN IMMEDIATE covering DDL as well as DML (see the SQLAlchemy
+    # docs on "Serializable isolation / Savepoints / Transactional DDL").
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+def _statement(sql_query):
+    # Plain SQL, or a prepared text() e.g. with expanding IN parameters
+    return text(sql_query) if isinstance(sql_query, str) else sql_query
+
+
+def _chunks(rows, chunk_size):
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        yield chunk
+
+
+def _increment_version(conn, table_name):
+    conn.execute(
+        text(
+            """
+            INSERT INTO table_versions (table_name, version)
+            VALUES (:table_name, 1)
+            ON CONFLICT (table_name) DO UPDATE SET version = version + 1
+            """
+        ),
+        {"table_name": table_name},
+    )
 
 
 class DBManager:
     def __init__(self, db_path, metadata=None):
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+        self.db_path = Path(db_path)
+        self.engine = _configure_writer(
+            create_engine(f"sqlite:///{db_path}", echo=False)
+        )
+        # Pages only ever read, so they share a pool of long-lived read-only
+        # connections. Keeping the connections open lets sqlite reuse its
+        # prepared statements for the (parameterised) page queries. The file
+        # isn't opened as immutable because model runs are loaded into it
+        # while the app is running.
+        self.read_engine = create_engine(
+            f"sqlite:///file:{db_path}?mode=ro&uri=true",
+            echo=False,
+            pool_size=READ_POOL_SIZE,
+        )
         self.metadata = metadata
-        self.tables = self.metadata.tables
+        self.tables = _Tables(self.metadata, self.read_engine)
 
     @property
     def metadata(self):
@@ -19,7 +187,6 @@ class DBManager:
     def metadata(self, value):
         if value is None:
             self._metadata = sa.MetaData()
-            self._metadata.reflect(bind=self.engine)
         else:
             self._metadata = value
 
@@ -28,11 +195,457 @@ class DBManager:
         dele = table.delete().where(table.c.season == season)
         with self.engine.connect() as conn:
             conn.execute(dele)
+            if table_name in RUN_TABLES and "runs" in self.tables:
+                self._sync_runs(conn, table_name)
+            self._bump_version(conn, table_name)
             conn.commit()
 
-    def query(self, sql_query):
-        query = text(sql_query)
+    def bulk_insert(self, table_name, rows, columns=None, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Insert rows in a single transaction, `chunk_size` rows per executemany.
+
+        `rows` is a DataFrame, or an iterable of tuples in the order of `columns`.
+        Returns the number of rows inserted.
+        """
+        with self.engine.begin() as conn:
+            n_rows = self._insert_chunks(conn, table_name, rows, columns, chunk_size)
+            self._bump_version(conn, table_name)
+            return n_rows
+
+    def replace_rows(
+        self,
+        table_name,
+        rows,
+        season,
+        gameweek=None,
+        columns=None,
+        chunk_size=BULK_CHUNK_SIZE,
+        defer_indexes=True,
+        conn=None,
+    ):
+        """
+        Swap a season's (or a season and gameweek's) rows for `rows` atomically.
+
+        The delete and the load are one transaction, so the pages see either the
+        old rows or the new ones, never a partial load. With `defer_indexes` the
+        table's indexes are dropped for the load and rebuilt once at the end,
+        which is much faster than maintaining them row by row. Pass `conn`
+        (from `engine.begin()`) to swap several tables in one transaction.
+        """
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.replace_rows(
+                    table_name,
+                    rows,
+                    season,
+                    gameweek,
+                    columns,
+                    chunk_size,
+                    defer_indexes,
+                    conn,
+                )
+
+        table = self.tables[table_name]
+        where = table.c.season == season
+        if gameweek is not None:
+            where &= table.c.gameweek == gameweek
+
+        conn.execute(table.delete().where(where))
+        indexes = []
+        if defer_indexes:
+            indexes = conn.execute(
+                text(
+                    """
+                    SELECT name, sql
+                    FROM sqlite_master
+                    WHERE type = 'index' AND tbl_name = :table_name
+                    AND sql IS NOT NULL
+                    """
+                ),
+                {"table_name": table_name},
+            ).all()
+            for name, _ in indexes:
+                conn.exec_driver_sql(f"DROP INDEX {name}")
+
+        n_rows = self._insert_chunks(conn, table_name, rows, columns, chunk_size)
+
+        for _, sql in indexes:
+            conn.exec_driver_sql(sql)
+        if table_name in RUN_TABLES and "runs" in self.tables:
+            self._sync_runs(conn, table_name)
+        self._bump_version(conn, table_name)
+        return n_rows
+
+    def _bump_version(self, conn, table_name):
+        # Once per load, whatever its size, and in its transaction
+        if "table_versions" in self.tables:
+            _increment_version(conn, table_name)
+
+    def _insert_chunks(self, conn, table_name, rows, columns, chunk_size):
+        if isinstance(rows, pd.DataFrame):
+            columns = list(rows.columns) if columns is None else list(columns)
+            rows = rows[columns]
+            # sqlite can't bind Timestamps
+            for col in rows.select_dtypes(include=["datetime", "datetimetz"]):
+                rows = rows.assign(**{col: rows[col].astype(str)})
+            rows = zip(*(rows[col].tolist() for col in columns))
+        elif columns is None:
+            columns = [c.name for c in self.tables[table_name].columns]
+
+        insert = (
+            f"INSERT INTO {table_name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        n_rows = 0
+        for chunk in _chunks(rows, chunk_size):
+            conn.exec_driver_sql(insert, chunk)
+            n_rows += len(chunk)
+        return n_rows
+
+    def _run_ddl(self, statements, what):
+        try:
+            with self.engine.connect() as conn:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(text(statement))
+                conn.commit()
+        except sa.exc.OperationalError as e:
+            # e.g. the db is on a read-only mount; queries still work, just slower
+            logger.warning(f"Could not create {what}: {e}")
+
+    def ensure_indexes(self):
+        """Create any missing INDEXES. Safe to call on every startup."""
+        self._run_ddl(
+            [
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} ({', '.join(columns)})"
+                for name, (table_name, columns) in INDEXES.items()
+                if table_name in self.tables
+            ],
+            "indexes",
+        )
+
+    def ensure_runs(self):
+        """
+        Create the `runs` registry, which holds the latest created_at per
+        (table, gameweek) and is kept current by insert triggers, and bring it
+        up to date. Likewise the `table_versions` counters of the writes to
+        VERSIONED_TABLES. Safe to call on every startup.
+        """
+        statements = [
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                table_name TEXT NOT NULL,
+                gameweek INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (table_name, gameweek)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+            """,
+        ]
+        for table_name, split in RUN_TABLES.items():
+            if table_name not in self.tables:
+                continue
+            statements.append(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table_name}_runs
+                AFTER INSERT ON {table_name}
+                BEGIN
+                    INSERT INTO runs (table_name, gameweek, created_at)
+                    VALUES ('{table_name}', {f"NEW.{split}" if split else 0}, NEW.created_at)
+                    ON CONFLICT (table_name, gameweek) DO UPDATE
+                    SET created_at = excluded.created_at
+                    WHERE excluded.created_at > runs.created_at;
+                END
+                """
+            )
+            statements.append(
+                lambda conn, table_name=table_name: self._sync_runs(conn, table_name)
+            )
+        statements += [
+            lambda conn, table_name=table_name: self._count_writes(conn, table_name)
+            for table_name in VERSIONED_TABLES
+            if table_name in self.tables
+        ]
+        self._run_ddl(statements, "runs registry")
+
+    def _count_writes(self, conn, table_name):
+        # Only for a table that isn't counted yet, whose version is then
+        # bumped, as it may have been loaded since it was created
+        if table_name in UNTRIGGERED_TABLES:
+            counted = conn.execute(
+                text("SELECT 1 FROM table_versions WHERE table_name = :table_name"),
+                {"table_name": table_name},
+            ).first()
+            if counted:
+                return
+        else:
+            triggers = [f"trg_{table_name}_{e.lower()}_version" for e in WRITE_EVENTS]
+            existing = conn.execute(
+                text(
+                    "SELECT COUNT(*) FROM sqlite_master "
+                    "WHERE type = 'trigger' AND name IN :triggers"
+                ).bindparams(bindparam("triggers", expanding=True)),
+                {"triggers": triggers},
+            ).scalar()
+            if existing == len(triggers):
+                return
+            for trigger, event_name in zip(triggers, WRITE_EVENTS):
+                conn.execute(
+                    text(
+                        f"""
+                        CREATE TRIGGER IF NOT EXISTS {trigger}
+                        AFTER {event_name} ON {table_name}
+                        BEGIN
+                            INSERT INTO table_versions (table_name, version)
+                            VALUES ('{table_name}', 1)
+                            ON CONFLICT (table_name) DO UPDATE
+                            SET version = version + 1;
+                        END
+                        """
+                    )
+                )
+        _increment_version(conn, table_name)
+
+    def _sync_runs(self, conn, table_name):
+        # Rebuild a table's runs from the (indexed) created_at column. Only
+        # if they're out of date, so a no-op startup doesn't write
+        split = RUN_TABLES[table_name]
+        latest = f"""
+            SELECT gameweek, created_at
+            FROM (
+                SELECT {split or 0} AS gameweek, MAX(created_at) AS created_at
+                FROM {table_name}
+                {f"GROUP BY {split}" if split else ""}
+            )
+            WHERE created_at IS NOT NULL
+        """
+        params = {"table_name": table_name}
+        current = conn.execute(
+            text(
+                "SELECT gameweek, created_at FROM runs WHERE table_name = :table_name"
+            ),
+            params,
+        )
+        if sorted(map(tuple, current)) == sorted(
+            map(tuple, conn.execute(text(latest)))
+        ):
+            return
+
+        conn.execute(text("DELETE FROM runs WHERE table_name = :table_name"), params)
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO runs (table_name, gameweek, created_at)
+                SELECT :table_name, gameweek, created_at
+                FROM ({latest})
+                """
+            ),
+            params,
+        )
+
+    def latest_run(self, table_name, gameweek=0):
+        """created_at of the latest run loaded into a table, or None if there isn't one."""
+        try:
+            rows = self.query(
+                """
+                SELECT created_at
+                FROM runs
+                WHERE table_name = :table_name AND gameweek = :gameweek
+                """,
+                {"table_name": table_name, "gameweek": gameweek},
+            )
+        except sa.exc.OperationalError:
+            rows = []  # no registry: the db was read-only at startup
+        if rows:
+            return rows[0][0]
+
+        # Not registered, e.g. the table was created since ensure_runs: use
+        # the index instead
+        split = RUN_TABLES[table_name]
+        try:
+            rows = self.query(
+                f"""
+                SELECT MAX(created_at)
+                FROM {table_name}
+                {f"WHERE {split} = :gameweek" if split else ""}
+                """,
+                {"gameweek": gameweek},
+            )
+        except sa.exc.OperationalError:
+            return None  # no such table
+        return rows[0][0]
+
+    def data_version(self, *table_names):
+        """
+        The version of the data in `table_names` (by default VERSIONED_TABLES):
+        their write counters, so unlike the db's files it only changes with
+        the data.
+        """
+        q = text(
+            """
+            SELECT table_name, version
+            FROM table_versions
+            WHERE table_name IN :table_names
+            ORDER BY table_name
+            """
+        ).bindparams(bindparam("table_names", expanding=True))
+        try:
+            rows = self.query(q, {"table_names": list(table_names or VERSIONED_TABLES)})
+        except sa.exc.OperationalError:
+            # No counters (the db was read-only at startup): the mtimes of the
+            # db and its WAL, which change with every write and then some
+            version = []
+            for suffix in ("", "-wal"):
+                try:
+                    version.append(os.stat(f"{self.db_path}{suffix}").st_mtime_ns)
+                except FileNotFoundError:
+                    version.append(0)
+            return tuple(version)
+        return tuple(tuple(row) for row in rows)
+
+    def execute(self, sql_query, params=None):
         with self.engine.connect() as conn:
-            result = conn.execute(query)
+            conn.execute(_statement(sql_query), params or {})
             conn.commit()
-            return result
+
+    @timed("db.query")
+    def query(self, sql_query, params=None):
+        with self.read_engine.connect() as conn:
+            return conn.execute(_statement(sql_query), params or {}).all()
+
+    @timed("db.query_df")
+    def query_df(self, sql_query, params=None):
+        with self.read_engine.connect() as conn:
+            result = conn.execute(_statement(sql_query), params or {})
+            return pd.DataFrame.from_records(
+                result.fetchall(), columns=list(result.keys())
+            )
+
+    @timed("db.query_array")
+    def query_array(self, sql_query, dtype, params=None, chunk_size=10_000):
+        """
+        Stream the rows of a query into a NumPy structured array.
+
+        The selected columns must be in the same order as the fields of `dtype`.
+        """
+        dtype = np.dtype(dtype)
+        chunks = []
+        with self.read_engine.connect() as conn:
+            result = conn.execute(_statement(sql_query), params or {})
+            while rows := result.fetchmany(chunk_size):
+                chunks.append(
+                    np.fromiter(map(tuple, rows), dtype=dtype, count=len(rows))
+                )
+        if not chunks:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate(chunks)
+
+    def snapshot_path(self, table_name):
+        return self.db_path.parent / "snapshots" / f"{table_name}.arrow"
+
+    def export_snapshot(self, table_name):
+        """
+        Write the latest snapshot of a table to an Arrow IPC file beside the db.
+        """
+        partition = SNAPSHOT_TABLES[table_name]
+        metadata = {}
+        if partition is None:
+            # Without a created_at to check, record the version; read before
+            # the rows, so they're never older than it says
+            metadata["version"] = json.dumps(self.data_version(table_name))
+            q = f"SELECT * FROM {table_name}"
+        else:
+            keys = ", ".join(partition + ("created_at",))
+            group_by = f"GROUP BY {', '.join(partition)}" if partition else ""
+            q = f"""
+            SELECT *
+            FROM {table_name}
+            WHERE ({keys}) IN (
+                SELECT {", ".join(partition + ("MAX(created_at)",))}
+                FROM {table_name}
+                {group_by}
+            )
+            """
+        if table_name in SNAPSHOT_KEYS:
+            q += f" ORDER BY {', '.join(SNAPSHOT_KEYS[table_name])}, rowid"
+        table = pa.Table.from_pandas(self.query_df(q), preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), **metadata}
+        )
+
+        path = self.snapshot_path(table_name)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)  # readers never see a half-written file
+        return path
+
+    def publish_snapshots(self):
+        return [
+            self.export_snapshot(table_name)
+            for table_name in SNAPSHOT_TABLES
+            if table_name in self.tables
+        ]
+
+    @timed("db.read_snapshot")
+    def read_snapshot(self, table_name, created_at=None, columns=None, filters=None):
+        """
+        Memory-map a published snapshot as an Arrow table.
+
+        For a run table, only the rows of the run `created_at`; for scorelines,
+        only if nothing has been loaded since it was exported. Returns None if
+        there are no such rows (or no snapshot), in which case callers should
+        fall back to querying.
+        """
+        path = self.snapshot_path(table_name)
+        try:
+            reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        except FileNotFoundError:
+            return None
+
+        filters = dict(filters or {})
+        if SNAPSHOT_TABLES[table_name] is None:
+            exported = (reader.schema.metadata or {}).get(b"version")
+            if exported != json.dumps(self.data_version(table_name)).encode():
+                return None
+        else:
+            # Each partition's latest run when it was exported, which may not
+            # be the caller's by now
+            filters["created_at"] = created_at
+
+        table = reader.read_all()
+        if filters:
+            mask = None
+            for col, value in filters.items():
+                cond = pc.equal(table[col], value)
+                mask = cond if mask is None else pc.and_(mask, cond)
+            rows = pc.indices_nonzero(mask).to_numpy()
+            if not len(rows) and "created_at" in filters:
+                return None
+            if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+                table = table.slice(rows[0], len(rows))
+            else:
+                table = table.take(rows)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table
+
+    def read_snapshot_array(self, table_name, dtype, filters=None):
+        """read_snapshot, returned as a NumPy structured array like query_array."""
+        dtype = np.dtype(dtype)
+        table = self.read_snapshot(table_name, columns=dtype.names, filters=filters)
+        if table is None:
+            return None
+        arr = np.empty(table.num_rows, dtype=dtype)
+        for name in dtype.names:
+            arr[name] = table[name].to_numpy()
+        return arr
@@ -0,0 +1,60 @@
+import streamlit as st
+from figure_cache import figure_cache
+from profiling import PROFILE_DIR, timings
+
+
+def loader_hit_rates(df_timings):
+    """Hit rate per cached loader, from its calls and its misses."""
+    calls = df_timings.set_index("operation")["calls"]
+    loaders = [
+        op for op in calls.index if op.startswith("loader.") and "(miss)" not in op
+    ]
+    return {
+        op.removeprefix("loader."): 1 - calls.get(f"{op} (miss)", 0) / calls[op]
+        for op in loaders
+    }
+
+
+def render():
+    """This process's timings, shown on About with ?diagnostics in the URL."""
+    st.title("🦁 Diagnostics")
+    st.caption(
+        "Timings for this server process since it started (or was last reset). "
+        "Loader times include cache hits; `(miss)` rows are the calls that ran the loader."
+    )
+    if st.button("Reset"):
+        timings.reset()
+
+    st.subheader("Figure Cache")
+    cols = st.columns(4)
+    lookups = figure_cache.hits + figure_cache.misses
+    cols[0].metric("Hits", figure_cache.hits)
+    cols[1].metric("Misses", figure_cache.misses)
+    cols[2].metric("Hit Rate", f"{figure_cache.hits / lookups:.0%}" if lookups else "-")
+    cols[3].metric("Cached", f"{figure_cache.nbytes / 2**20:.1f} MiB")
+
+    df_timings = timings.summary()
+    if not len(df_timings):
+        st.info("Nothing has been timed yet.")
+        return
+
+    st.subheader("Loader Cache Hit Rates")
+    rates = loader_hit_rates(df_timings)
+    st.dataframe(
+        {"loader": list(rates), "hit_rate": list(rates.values())},
+        hide_index=True,
+        column_config={
+            "hit_rate": st.column_config.NumberColumn("Hit Rate", format="percent")
+        },
+    )
+
+    st.subheader("Timings")
+    st.dataframe(df_timings.round(2), hide_index=True)
+
+    operation = st.selectbox(
+        "Latency histogram (calls per bucket, ms)", df_timings["operation"]
+    )
+    st.bar_chart(timings.histogram(operation))
+
+    if PROFILE_DIR:
+        st.write(f"Page reruns are being profiled to `{PROFILE_DIR}`.")
@@ -0,0 +1,130 @@
+import numpy as np
+from sqlalchemy import text
+
+ACTUAL = "y"
+MODELS = [
+    "y_Naive",
+    "y_LGBMRegressor_no_exog",
+    "y_LGBMRegressor_with_exog",
+    "y_LSTMWithReLU",
+]
+
+# Sums rather than the metrics themselves, so gameweeks, positions and seasons
+# can be combined after the fact
+METRICS_TABLE = """
+CREATE TABLE IF NOT EXISTS model_metrics (
+    season INTEGER NOT NULL,
+    gameweek INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    position TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    sum_pred REAL NOT NULL,
+    sum_actual REAL NOT NULL,
+    sum_abs_error REAL NOT NULL,
+    sum_sq_error REAL NOT NULL,
+    sum_pred_sq REAL NOT NULL,
+    sum_pred_actual REAL NOT NULL,
+    PRIMARY KEY (season, gameweek, model, position)
+)
+"""
+
+SUM_COLUMNS = [
+    "n",
+    "sum_pred",
+    "sum_actual",
+    "sum_abs_error",
+    "sum_sq_error",
+    "sum_pred_sq",
+    "sum_pred_actual",
+]
+
+
+def _metrics_select(model):
+    # Model names are our own constants, never user input
+    return f"""
+    SELECT season, gameweek, '{model}', position,
+        COUNT(*),
+        SUM({model}),
+        SUM({ACTUAL}),
+        SUM(ABS({model} - {ACTUAL})),
+        SUM(({model} - {ACTUAL}) * ({model} - {ACTUAL})),
+        SUM({model} * {model}),
+        SUM({model} * {ACTUAL})
+    FROM player_predictions
+    WHERE season = :season AND gameweek = :gameweek
+    AND {ACTUAL} IS NOT NULL AND {model} IS NOT NULL
+    GROUP BY season, gameweek, position
+    """
+
+
+def update_gameweek_metrics(dbm, season, gameweek, conn=None):
+    """Recompute one gameweek's rows of model_metrics from its predictions."""
+    if conn is None:
+        with dbm.engine.begin() as conn:
+            return update_gameweek_metrics(dbm, season, gameweek, conn)
+
+    params = {"season": season, "gameweek": gameweek}
+    conn.execute(
+        text(
+            "DELETE FROM model_metrics WHERE season = :season AND gameweek = :gameweek"
+        ),
+        params,
+    )
+    conn.execute(
+        text(
+            f"INSERT INTO model_metrics (season, gameweek, model, position, {', '.join(SUM_COLUMNS)}) "
+            + " UNION ALL ".join(_metrics_select(model) for model in MODELS)
+        ),
+        params,
+    )
+
+
+def update_metrics(dbm):
+    """
+    Bring model_metrics up to date with player_predictions.
+
+    Only gameweeks from the latest one already in model_metrics onwards are
+    (re)computed, so each week's update reads that week's predictions rather
+    than the whole history. Returns the (season, gameweek)s updated.
+    """
+    dbm.execute(METRICS_TABLE)
+    dbm.ensure_runs()  # count the writes to model_metrics
+    with dbm.engine.begin() as conn:
+        latest = conn.execute(
+            text(
+                "SELECT season, gameweek FROM model_metrics "
+                "ORDER BY season DESC, gameweek DESC LIMIT 1"
+            )
+        ).first() or (0, 0)
+        gameweeks = conn.execute(
+            text(
+                f"""
+                SELECT season, gameweek
+                FROM player_predictions
+                WHERE (season, gameweek) >= (:season, :gameweek)
+                AND {ACTUAL} IS NOT NULL
+                GROUP BY season, gameweek
+                """
+            ),
+            {"season": latest[0], "gameweek": latest[1]},
+        ).all()
+        for season, gameweek in gameweeks:
+            update_gameweek_metrics(dbm, season, gameweek, conn)
+    return [tuple(gw) for gw in gameweeks]
+
+
+def summarise_metrics(df_sums, by):
+    """
+    MAE, RMSE, bias (mean prediction - mean actual) and calibration slope
+    (of actual on predicted points; 1 is well calibrated) from model_metrics
+    rows, summed over everything not in `by`.
+    """
+    df = df_sums.groupby(by, as_index=False)[SUM_COLUMNS].sum()
+    n = df["n"]
+    df["mae"] = df["sum_abs_error"] / n
+    df["rmse"] = np.sqrt(df["sum_sq_error"] / n)
+    df["bias"] = (df["sum_pred"] - df["sum_actual"]) / n
+    var_pred = n * df["sum_pred_sq"] - df["sum_pred"] ** 2
+    cov = n * df["sum_pred_actual"] - df["sum_pred"] * df["sum_actual"]
+    df["calibration_slope"] = cov / var_pred.where(var_pred > 0)
+    return df.drop(columns=SUM_COLUMNS[1:])
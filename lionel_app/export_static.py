@@ -0,0 +1,254 @@
+"""
+Export the pages' figures for the next gameweek as static HTML and JSON.
+
+Team Selection, Scoreline Predictions (every fixture) and Inference only
+change with a model run, so a static server or CDN can serve them from the
+export, with the app as the fallback for everything else:
+
+    python lionel_app/export_static.py site/ [--db data/lionel.db] [--app-url URL]
+
+Writes an HTML page per app page (sharing one plotly.min.js), each figure's
+Plotly JSON under figures/, the fixtures' outcomes as outcomes.json, and a
+manifest.json of what was exported from which runs. Each export is written to
+its own site/export-<time>/ and published by atomically repointing the
+site/current symlink at it, so serve site/current. Exports are skipped if the
+runs haven't changed since the last one.
+"""
+
+import argparse
+import datetime as dt
+import html
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import plotly.io as pio
+from figure_cache import figure_cache
+from plotly.offline import get_plotlyjs
+from utils import get_gameweek, setup_logger
+
+logger = setup_logger(__name__)
+
+# Exports kept besides the current one, for requests still reading them
+KEEP_PREVIOUS = 1
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>lionel - {title}</title>
+<script src="plotly.min.js"></script>
+<style>
+body {{ font-family: sans-serif; color: #1f2937; max-width: 1000px; margin: 0 auto; padding: 1rem; }}
+nav a {{ margin-right: 1rem; }}
+table {{ border-collapse: collapse; }}
+th, td {{ padding: 0.25rem 0.75rem; text-align: right; border-bottom: 1px solid #e5e7eb; }}
+footer {{ margin-top: 2rem; color: #4b5563; font-size: 0.875rem; }}
+</style>
+</head>
+<body>
+<nav>{nav}</nav>
+<h1>🦁 {title}</h1>
+{body}
+<footer>Gameweek {gameweek}, exported {exported_at}.{live}</footer>
+</body>
+</html>
+"""
+
+PAGES = {
+    "index.html": "lionel",
+    "team_selection.html": "Team Selections",
+    "scoreline_predictions.html": "Scoreline Predictions",
+    "inference.html": "Inference",
+}
+
+# As the Scoreline Predictions page shows them
+OUTCOME_COLUMNS = {
+    "home": "Home",
+    "away": "Away",
+    "p_home_win": "Home Win",
+    "p_draw": "Draw",
+    "p_away_win": "Away Win",
+    "p_home_clean_sheet": "Home Clean Sheet",
+    "p_away_clean_sheet": "Away Clean Sheet",
+    "xg_home": "Home xG",
+    "xg_away": "Away xG",
+}
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def figure_html(fig_json, name):
+    # The JSON came from a valid figure, so skip plotly's (slow) validation
+    return pio.to_html(
+        json.loads(fig_json),
+        full_html=False,
+        include_plotlyjs=False,
+        validate=False,
+        div_id=slug(name),
+    )
+
+
+def outcomes_html(df_outcomes):
+    columns = [c for c in OUTCOME_COLUMNS if c in df_outcomes]
+    formatters = {c: "{:.0%}".format for c in columns if c.startswith("p_")}
+    formatters |= {c: "{:.2f}".format for c in columns if c.startswith("xg_")}
+    return (
+        df_outcomes[columns]
+        .rename(columns=OUTCOME_COLUMNS)
+        .to_html(
+            index=False,
+            border=0,
+            formatters={OUTCOME_COLUMNS[c]: f for c, f in formatters.items()},
+        )
+    )
+
+
+def page_bodies(figures, df_outcomes, gameweek):
+    """The HTML body of each page, from the figures' JSON by name."""
+
+    def section(heading, name):
+        if name not in figures:  # couldn't be built, e.g. no runs yet
+            return f"<h2>{html.escape(heading)}</h2><p>Not available.</p>"
+        return f"<h2>{html.escape(heading)}</h2>{figure_html(figures[name], name)}"
+
+    matches = [name for name in figures if name.startswith("scoreline-")]
+    player_inference = [n for n in figures if n.startswith("player_inference-")]
+    return {
+        "index.html": "<ul>"
+        + "".join(
+            f'<li><a href="{page}">{title}</a></li>'
+            for page, title in PAGES.items()
+            if page != "index.html"
+        )
+        + "</ul>",
+        "team_selection.html": section(
+            f"Team Selections for Gameweek {gameweek}", "selection"
+        )
+        + section(f"Team Forecasts and Values for Gameweek {gameweek}", "value"),
+        "scoreline_predictions.html": f"<h2>All Gameweek {gameweek} Fixtures</h2>"
+        + outcomes_html(df_outcomes)
+        + "".join(section(name.removeprefix("scoreline-"), name) for name in matches),
+        "inference.html": "".join(
+            section(
+                "Player Inference (minimum average minutes "
+                f"{name.removeprefix('player_inference-')})",
+                name,
+            )
+            for name in player_inference
+        )
+        + section("Team Inference", "team_inference"),
+    }
+
+
+def export(dbm, loaders, out, app_url=None, force=False):
+    """
+    Export the next gameweek's pages to `out`. Returns the manifest, or None
+    if the last export there is of the same runs.
+    """
+    from precompute import page_figures
+
+    out = Path(out)
+    current = out / "current"
+    gameweek = get_gameweek(dbm)
+    specs = page_figures(dbm, loaders, gameweek)
+    # What each figure was built from, JSON-safe
+    versions = json.loads(
+        json.dumps({name: spec[1] for name, spec in specs.items()}, default=str)
+    )
+    try:
+        previous = json.loads((current / "manifest.json").read_text())
+    except FileNotFoundError:
+        previous = None
+    if not force and previous and previous["versions"] == versions:
+        return None
+
+    figures = {}
+    for name, spec in specs.items():
+        try:
+            # Published by precompute.py, if it's run; built here if not
+            figures[name] = figure_cache.get_json(*spec)
+        except Exception:
+            logger.exception(f"Could not build the {name} figure")
+    df_outcomes = loaders.get_gameweek_outcomes(gameweek, dbm.data_version())
+
+    # Write everything to a new directory, then repoint `current` at it, so a
+    # server never serves a mix of two exports or finds nothing there
+    now = dt.datetime.now()
+    export_dir = out / f"export-{now:%Y%m%dT%H%M%S%f}"
+    (export_dir / "figures").mkdir(parents=True)
+    for name, fig_json in figures.items():
+        (export_dir / "figures" / f"{slug(name)}.json").write_text(fig_json)
+    (export_dir / "outcomes.json").write_text(df_outcomes.to_json(orient="records"))
+    (export_dir / "plotly.min.js").write_text(get_plotlyjs())
+
+    exported_at = now.isoformat(timespec="seconds")
+    live = (
+        f' <a href="{html.escape(app_url)}">Open the live app</a>.' if app_url else ""
+    )
+    for page, body in page_bodies(figures, df_outcomes, gameweek).items():
+        nav = "".join(f'<a href="{p}">{title}</a>' for p, title in PAGES.items())
+        (export_dir / page).write_text(
+            PAGE.format(
+                title=PAGES[page],
+                nav=nav,
+                body=body,
+                gameweek=gameweek,
+                exported_at=exported_at,
+                live=live,
+            )
+        )
+
+    manifest = {
+        "gameweek": gameweek,
+        "exported_at": exported_at,
+        "versions": versions,
+        "figures": {name: f"figures/{slug(name)}.json" for name in figures},
+    }
+    (export_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    link = out / ".current.tmp"
+    link.unlink(missing_ok=True)
+    link.symlink_to(export_dir.name, target_is_directory=True)
+    os.replace(link, current)  # rename(2) over the old link is atomic
+
+    exports = sorted(out.glob("export-*"), reverse=True)
+    for stale in exports[1 + KEEP_PREVIOUS :]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the pages' figures for the next gameweek as static HTML and JSON."
+    )
+    parser.add_argument("out", help="directory to export to; serve its current/")
+    parser.add_argument("--db", help="path to lionel.db (default: the app's)")
+    parser.add_argument("--app-url", help="the live app, linked from every page")
+    parser.add_argument(
+        "--force", action="store_true", help="export even if the runs are unchanged"
+    )
+    args = parser.parse_args()
+
+    # About builds the DBManager the pages share on import, from LIONEL_DB
+    if args.db:
+        os.environ["LIONEL_DB"] = os.path.abspath(args.db)
+    import loaders
+    from About import dbm
+
+    manifest = export(dbm, loaders, args.out, args.app_url, args.force)
+    if manifest is None:
+        logger.info(f"{args.out} is already up to date")
+    else:
+        logger.info(
+            f"Exported gameweek {manifest['gameweek']} "
+            f"({len(manifest['figures'])} figures) to {args.out}"
+        )
+
+
+if __name__ == "__main__":
+    main()
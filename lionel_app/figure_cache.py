@@ -0,0 +1,118 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import plotly.graph_objects as go
+from profiling import timer
+
+MAX_BYTES = 64 * 2**20
+
+
+class FigureCache:
+    """
+    Built figures, shared by every session in the process.
+
+    Figures are keyed on (figure type, data snapshot, parameters) and stored as
+    JSON, least recently used first out once the JSON exceeds `max_bytes`. When
+    a figure type is requested for a new snapshot, its figures for older
+    snapshots are dropped.
+
+    With a `directory`, misses first look there for a figure published ahead
+    of time by precompute.py, and only build it if there isn't one.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()  # (kind, snapshot, params) -> JSON
+        self._snapshots = {}  # kind -> latest snapshot
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get_json(self, kind, snapshot, params, build):
+        """The figure's JSON, calling `build()` for the figure on a miss."""
+        key = (kind, snapshot, params)
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+            self.misses += 1
+            if self._snapshots.get(kind) != snapshot:
+                self._snapshots[kind] = snapshot
+                for stale in [k for k in self._figures if k[0] == kind]:
+                    self._bytes -= len(self._figures.pop(stale))
+
+        # Covers loading the figure's data on a cold loader cache too
+        with timer(f"figure.{kind}") as sample:
+            fig_json = self._read_published(key) or build().to_json()
+            sample["bytes"] = len(fig_json)
+        with self._lock:
+            if key not in self._figures:
+                self._figures[key] = fig_json
+                self._bytes += len(fig_json)
+            while self._bytes > self.max_bytes and len(self._figures) > 1:
+                _, evicted = self._figures.popitem(last=False)
+                self._bytes -= len(evicted)
+        return fig_json
+
+    def get(self, kind, snapshot, params, build):
+        """get_json, as a Figure ready for st.plotly_chart."""
+        # The JSON came from a valid figure, so skip plotly's (slow) validation
+        return go.Figure(
+            json.loads(self.get_json(kind, snapshot, params, build)), _validate=False
+        )
+
+    def has(self, kind, snapshot, params):
+        """Whether get would be cheap: the figure is cached or published."""
+        with self._lock:
+            if (kind, snapshot, params) in self._figures:
+                return True
+        return self.directory is not None and self.path(kind, snapshot, params).exists()
+
+    def getter(self, kind, snapshot, params, build):
+        """get as a no-argument call for prefetch, marked `cached` if it would hit."""
+        call = functools.partial(self.get, kind, snapshot, params, build)
+        call.cached = self.has(kind, snapshot, params)
+        return call
+
+    def path(self, kind, snapshot, params):
+        # repr is stable across processes for the str/int/tuple keys we use
+        digest = hashlib.sha1(repr((snapshot, params)).encode()).hexdigest()[:16]
+        return Path(self.directory) / f"{kind}-{digest}.json"
+
+    def _read_published(self, key):
+        if self.directory is None:
+            return None
+        try:
+            return self.path(*key).read_text()
+        except FileNotFoundError:
+            return None
+
+    def publish(self, kind, snapshot, params, build):
+        """Build a figure and write it to `directory` for every process to read."""
+        path = self.path(kind, snapshot, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(build().to_json())
+        os.replace(tmp, path)  # readers never see a half-written file
+        return path
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self._snapshots.clear()
+            self._bytes = 0
+
+
+figure_cache = FigureCache()
@@ -0,0 +1,271 @@
+# The data behind the pages' figures, shared by the pages and precompute.py
+import pandas as pd
+import streamlit as st
+from About import dbm
+from plot_players import build_player_inf_plot
+from profiling import cached
+from plot_team import (
+    build_scoreline_plot,
+    build_team_inf_plot,
+    create_plot,
+    create_value_plot,
+)
+from scorelines import (
+    DRAW_DTYPE,
+    joint_counts,
+    outcome_probabilities,
+    scoreline_matrix,
+    summaries_current,
+)
+from sqlalchemy import bindparam, text
+from utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+# Loaders take the version of the data they read (a run's created_at, or
+# dbm.data_version()) so they're only re-run when it changes; max_entries
+# ages out old versions
+
+
+def snapshot_frame(snapshot):
+    # Not consolidated into 2D blocks, which would copy every column: the
+    # columns without nulls stay views of the memory-mapped file, so every
+    # process shares the one copy in the page cache
+    return snapshot.to_pandas(split_blocks=True)
+
+
+# cache_resource hands every rerun the same frame rather than a copy (and so
+# keeps a snapshot's views), which is fine because the plotting functions only
+# read it
+@cached(
+    st.cache_resource(max_entries=4, show_spinner="Pulling data..."),
+    "loader.get_df_sel",
+)
+def get_df_sel(gameweek, created_at):
+    snapshot = dbm.read_snapshot(
+        "selections", created_at, filters={"gameweek": gameweek}
+    )
+    if snapshot is not None:
+        df = snapshot_frame(snapshot)
+    else:
+        q = """
+        SELECT *
+        FROM selections
+        WHERE gameweek = :gameweek AND created_at = :created_at;
+        """
+        df = dbm.query_df(q, {"gameweek": gameweek, "created_at": created_at})
+
+    # Display columns for the plots, derived once per load
+    df["mean_points_pred"] = df["mean_points_pred"].round(1)
+    df["name"] = df["player"].str.split("_").str[1]
+    df["last_name"] = df["name"].str.split().str[-1]
+    return df
+
+
+@cached(
+    st.cache_resource(max_entries=2, show_spinner="Pulling data..."),
+    "loader.get_df_player_inf",
+)
+def get_df_player_inf(created_at):
+    snapshot = dbm.read_snapshot("player_inference", created_at)
+    if snapshot is not None:
+        df = snapshot_frame(snapshot)
+    else:
+        q = """
+        SELECT *
+        FROM player_inference
+        WHERE created_at = :created_at
+        """
+        df = dbm.query_df(q, {"created_at": created_at})
+    df["mean_minutes"] = df["mean_minutes"].round(0)
+    return df
+
+
+@cached(
+    st.cache_resource(max_entries=2, show_spinner="Pulling data..."),
+    "loader.get_df_team_inf",
+)
+def get_df_team_inf(created_at):
+    snapshot = dbm.read_snapshot("team_inference", created_at)
+    if snapshot is not None:
+        return snapshot_frame(snapshot)
+
+    q = """
+    SELECT *
+    FROM team_inference
+    WHERE created_at = :created_at
+    """
+    df_team_inf = dbm.query_df(q, {"created_at": created_at})
+    df_team_inf[["attack", "defence"]] = df_team_inf[["attack", "defence"]]
+    return df_team_inf
+
+
+def get_match_draws(home, away):
+    filters = {"home": home, "away": away}
+    draws = dbm.read_snapshot_array("scorelines", DRAW_DTYPE, filters)
+    if draws is not None:
+        return draws
+
+    q = """
+    SELECT home_goals, away_goals, chain, draw
+    FROM scorelines
+    WHERE home = :home AND away = :away
+    """
+    return dbm.query_array(q, DRAW_DTYPE, {"home": home, "away": away})
+
+
+@cached(
+    st.cache_data(max_entries=4, show_spinner="Pulling data..."),
+    "loader.get_summaries_current",
+)
+def get_summaries_current(gameweek, version):
+    """
+    Whether the gameweek's scoreline summaries can be read in place of the
+    draws: not if a run has been loaded as draws since they were written.
+    """
+    return "scoreline_counts" in dbm.tables and summaries_current(dbm, 25, gameweek)
+
+
+@cached(
+    st.cache_data(max_entries=64, show_spinner="Pulling data..."),
+    "loader.get_scoreline_matrix",
+)
+def get_scoreline_matrix(home, away, gameweek, version):
+    # Runs stored as summaries only keep a (possibly thinned) sample of draws
+    if get_summaries_current(gameweek, version):
+        q = """
+        SELECT home_goals, away_goals, n
+        FROM scoreline_counts
+        WHERE season = :season AND gameweek = :gameweek
+        AND home = :home AND away = :away
+        """
+        counts = dbm.query_df(
+            q, {"season": 25, "gameweek": gameweek, "home": home, "away": away}
+        )
+        if len(counts):
+            return scoreline_matrix(
+                counts["home_goals"], counts["away_goals"], weights=counts["n"]
+            )
+
+    draws = get_match_draws(home, away)
+    return scoreline_matrix(draws["home_goals"], draws["away_goals"])
+
+
+@cached(
+    st.cache_data(max_entries=4, show_spinner="Pulling data..."),
+    "loader.get_gameweek_outcomes",
+)
+def get_gameweek_outcomes(gameweek, version):
+    """Outcome probabilities and expected goals for all of a gameweek's fixtures."""
+    fixtures = pd.DataFrame(
+        [m.split(" vs ") for m in get_next_matches(gameweek, version)],
+        columns=["home", "away"],
+    )
+    counts = fixtures.iloc[:0]
+    if get_summaries_current(gameweek, version):
+        q = """
+        SELECT home, away, home_goals, away_goals, n
+        FROM scoreline_counts
+        WHERE season = :season AND gameweek = :gameweek
+        """
+        counts = dbm.query_df(q, {"season": 25, "gameweek": gameweek})
+
+    if not len(counts) and len(fixtures):
+        # All the fixtures' draws in one query, rather than one per match
+        q = text(
+            """
+            SELECT home, away, home_goals, away_goals
+            FROM scorelines
+            WHERE home IN :homes
+            """
+        ).bindparams(bindparam("homes", expanding=True))
+        draws = dbm.query_df(q, {"homes": fixtures["home"].tolist()})
+        if len(draws):
+            counts = joint_counts(draws, keys=("home", "away"))
+
+    if not len(counts):
+        return fixtures
+    # In fixture order, and only this gameweek's fixtures
+    return fixtures.merge(
+        outcome_probabilities(counts, keys=("home", "away")), on=["home", "away"]
+    )
+
+
+@cached(
+    st.cache_data(max_entries=8, show_spinner="Pulling data..."),
+    "loader.get_next_matches",
+)
+def get_next_matches(gameweek, version):
+    q = """
+    SELECT home.name as home, away.name as away
+    FROM fixtures
+    INNER JOIN teams as away
+    ON fixtures.home_id = away.id
+
+    INNER JOIN teams as home
+    ON fixtures.away_id = home.id
+
+    WHERE season = :season AND gameweek = :gameweek
+    """
+    df = dbm.query_df(q, {"season": 25, "gameweek": gameweek})
+
+    matches = (df["home"] + " vs " + df["away"]).to_list()
+    logger.debug(f"Next matches: {matches}")
+    return matches
+
+
+# Figures as (kind, snapshot, params, build) for figure_cache, so the pages and
+# precompute.py agree on their keys
+
+
+def selection_figure(gameweek):
+    created_at = dbm.latest_run("selections", gameweek)
+    return (
+        "selection",
+        created_at,
+        (gameweek,),
+        lambda: create_plot(get_df_sel(gameweek, created_at)),
+    )
+
+
+def value_figure(gameweek):
+    created_at = dbm.latest_run("selections", gameweek)
+    return (
+        "value",
+        created_at,
+        (gameweek,),
+        lambda: create_value_plot(get_df_sel(gameweek, created_at)),
+    )
+
+
+def player_inference_figure(min_minutes):
+    created_at = dbm.latest_run("player_inference")
+    return (
+        "player_inference",
+        created_at,
+        (min_minutes,),
+        lambda: build_player_inf_plot(get_df_player_inf(created_at), min_minutes),
+    )
+
+
+def team_inference_figure():
+    created_at = dbm.latest_run("team_inference")
+    return (
+        "team_inference",
+        created_at,
+        (),
+        lambda: build_team_inf_plot(get_df_team_inf(created_at)),
+    )
+
+
+def scoreline_figure(home, away, gameweek):
+    version = dbm.data_version()
+    return (
+        "scoreline",
+        version,
+        (home, away, gameweek),
+        lambda: build_scoreline_plot(
+            get_scoreline_matrix(home, away, gameweek, version), home, away
+        ),
+    )
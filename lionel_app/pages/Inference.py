@@ -1,9 +1,8 @@
-import pandas as pd
 import streamlit as st
-from About import dbm
-from plot_players import build_player_inf_plot
-from plot_team import build_team_inf_plot
-from utils import setup_logger
+from figure_cache import figure_cache
+from loaders import player_inference_figure, team_inference_figure
+from profiling import profile_page
+from utils import prefetch, setup_logger
 
 logger = setup_logger(__name__)
 logger.debug("Running from top")  # just useful to undserstand the order of execution
@@ -16,42 +15,16 @@ def initialise_session_vars():
         st.session_state.min_mins = 45
 
 
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
-def get_df_player_inf():
-    q = """
-    SELECT * 
-    FROM player_inference
-    WHERE created_at = (
-            SELECT MAX(created_at)
-            FROM player_inference
-        )
-    """
-    df = pd.DataFrame(dbm.query(q).all())
-    df["mean_minutes"] = df["mean_minutes"].round(0)
-    return df
-
-
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
-def get_df_team_inf():
-    q = """
-    SELECT * 
-    FROM team_inference
-    WHERE created_at = (
-            SELECT MAX(created_at)
-            FROM team_inference
-        )
-    """
-    df_team_inf = pd.DataFrame(dbm.query(q).all())
-    df_team_inf[["attack", "defence"]] = df_team_inf[["attack", "defence"]]
-    return df_team_inf
-
-
 def main():
     st.title("🦁 Player & Team Inference")
 
-    # Not great to reload this on each run...
-    df_player_inf = get_df_player_inf()
-    df_team_inf = get_df_team_inf()
+    # Data is only loaded when a figure isn't already cached for this run, and
+    # then both figures' data is loaded at once
+    min_mins = st.session_state.min_mins
+    player_fig, team_fig = prefetch(
+        figure_cache.getter(*player_inference_figure(min_mins)),
+        figure_cache.getter(*team_inference_figure()),
+    )
 
     tab1, tab2 = st.tabs(["🤖 Player Inference", ":chart: Team Inference"])
 
@@ -72,7 +45,7 @@ def main():
                 """
             )
         st.plotly_chart(
-            build_player_inf_plot(df_player_inf, st.session_state.min_mins),
+            player_fig,
             # use_container_width=True,
             height=2000,
             width=2000,
@@ -104,7 +77,7 @@ def main():
                 \end{align*}
             """
             )
-        st.plotly_chart(build_team_inf_plot(df_team_inf))
+        st.plotly_chart(team_fig)
 
 
 def sidebar():
@@ -118,6 +91,7 @@ if __name__ == "__main__":
     st.set_page_config(
         page_title="lionel - Forecasts",
     )
-    initialise_session_vars()
-    main()
-    sidebar()
+    with profile_page("Inference"):
+        initialise_session_vars()
+        main()
+        sidebar()
@@ -0,0 +1,77 @@
+import streamlit as st
+from About import dbm
+from evaluation import summarise_metrics
+from plot_players import POSITION_STYLES, build_model_metrics_plot
+from profiling import profile_page
+from utils import setup_logger
+
+logger = setup_logger(__name__)
+logger.debug("Running from top")  # just useful to undserstand the order of execution
+
+METRICS = {
+    "mae": "MAE",
+    "rmse": "RMSE",
+    "bias": "Bias",
+    "calibration_slope": "Calibration Slope",
+}
+
+
+# A few rows per model, position and gameweek, so the whole table is one read
+@st.cache_data(max_entries=2, show_spinner="Pulling data...")
+def get_model_metrics(version):
+    return dbm.query_df("SELECT * FROM model_metrics")
+
+
+def main(seasons, positions, metric):
+    st.title("🦁 Model Comparison")
+    with st.expander("More about model comparison"):
+        st.write(
+            "How each model's points predictions compare with the points players went on to score. "
+            "MAE and RMSE are the mean absolute and root mean squared errors; bias is the mean "
+            "prediction less the mean actual points. The calibration slope is that of actual on "
+            "predicted points: 1 is well calibrated, below 1 means the predictions are too spread out."
+        )
+
+    df = get_model_metrics(dbm.data_version())
+    df = df[df["season"].isin(seasons)]
+    if positions:
+        df = df[df["position"].isin(positions)]
+
+    st.subheader("Overall")
+    st.dataframe(
+        summarise_metrics(df, ["model"]).round(3),
+        hide_index=True,
+        column_config={"model": "Model", "n": "Predictions", **METRICS},
+    )
+
+    st.subheader(f"{METRICS[metric]} by Gameweek")
+    st.plotly_chart(
+        build_model_metrics_plot(
+            summarise_metrics(df, ["model", "season", "gameweek"]),
+            metric,
+            METRICS[metric],
+        )
+    )
+
+
+def sidebar():
+    all_seasons = sorted(
+        get_model_metrics(dbm.data_version())["season"].unique().tolist()
+    )
+    with st.sidebar:
+        st.title("Filter the comparison")
+        seasons = st.multiselect("Seasons", all_seasons, default=all_seasons[-1:])
+        positions = st.multiselect("Positions", list(POSITION_STYLES))
+        metric = st.selectbox("Metric", list(METRICS), format_func=METRICS.get)
+    return seasons, positions, metric
+
+
+if __name__ == "__main__":
+    st.set_page_config(
+        page_title="lionel - Model Comparison",
+    )
+    with profile_page("Model_Comparison"):
+        if "model_metrics" not in dbm.tables:
+            st.info("No model metrics have been computed yet.")
+            st.stop()
+        main(*sidebar())
@@ -0,0 +1,154 @@
+import streamlit as st
+from About import dbm
+from plot_players import POSITION_STYLES, PREDICTION_SERIES, show_player_fig
+from profiling import profile_page
+from sqlalchemy import bindparam, text
+from utils import prefetch, setup_logger
+
+logger = setup_logger(__name__)
+logger.debug("Running from top")  # just useful to undserstand the order of execution
+
+PAGE_SIZE = 50
+MAX_PLAYERS = 5
+
+
+def initialise_session_vars():
+    if "history_players" not in st.session_state:
+        st.session_state.history_players = []
+
+
+# Keyed on dbm.data_version(), so only re-queried when the db changes
+@st.cache_data(max_entries=2, show_spinner="Pulling data...")
+def get_filter_options(version):
+    rows = dbm.query(
+        "SELECT season, team_name FROM player_predictions GROUP BY season, team_name"
+    )
+    return sorted({r[0] for r in rows}), sorted({r[1] for r in rows})
+
+
+def _player_filter(seasons, teams, positions, search):
+    """WHERE clause, params and expanding (IN) params for the sidebar filters."""
+    where = ["season BETWEEN :first_season AND :last_season"]
+    params = {"first_season": seasons[0], "last_season": seasons[1]}
+    if teams:
+        where.append("team_name IN :teams")
+        params["teams"] = list(teams)
+    if positions:
+        where.append("position IN :positions")
+        params["positions"] = list(positions)
+    if search:
+        where.append("name LIKE :search")
+        params["search"] = f"%{search}%"
+    expanding = [
+        bindparam(k, expanding=True) for k in ("teams", "positions") if k in params
+    ]
+    return " AND ".join(where), params, expanding
+
+
+@st.cache_data(max_entries=100, show_spinner="Pulling data...")
+def count_players(seasons, teams, positions, search, version):
+    where, params, expanding = _player_filter(seasons, teams, positions, search)
+    q = text(
+        f"SELECT COUNT(DISTINCT name) FROM player_predictions WHERE {where}"
+    ).bindparams(*expanding)
+    return dbm.query(q, params)[0][0]
+
+
+@st.cache_data(max_entries=100, show_spinner="Pulling data...")
+def get_players(seasons, teams, positions, search, page, version):
+    """
+    One page of the players matching the filters, by name, with the team and
+    position of their latest gameweek that matches.
+    """
+    where, params, expanding = _player_filter(seasons, teams, positions, search)
+    q = text(
+        f"""
+        SELECT name, team_name, position
+        FROM (
+            SELECT name, team_name, position, ROW_NUMBER() OVER (
+                PARTITION BY name ORDER BY season DESC, gameweek DESC
+            ) AS recency
+            FROM player_predictions
+            WHERE {where}
+        )
+        WHERE recency = 1
+        ORDER BY name
+        LIMIT :limit OFFSET :offset
+        """
+    ).bindparams(*expanding)
+    params.update(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
+    return dbm.query_df(q, params)
+
+
+# Per player, so adding a player to the selection doesn't refetch the others
+@st.cache_data(max_entries=50, show_spinner="Pulling data...")
+def get_player_series(name, seasons, version):
+    q = f"""
+    SELECT name, team_name, position, season, gameweek, {", ".join(PREDICTION_SERIES)}
+    FROM player_predictions
+    WHERE name = :name AND season BETWEEN :first_season AND :last_season
+    ORDER BY season, gameweek
+    """
+    return dbm.query_df(
+        q, {"name": name, "first_season": seasons[0], "last_season": seasons[1]}
+    )
+
+
+def main(seasons, teams, positions, search):
+    st.title("🦁 Player History")
+    with st.expander("More about player history"):
+        st.write(
+            "Each player's points in past gameweeks alongside what each model predicted for them, "
+            "for back-testing the models against one another. Pick up to "
+            f"{MAX_PLAYERS} players from the list below; use the sidebar to narrow it down."
+        )
+
+    version = dbm.data_version()
+    n_players = count_players(seasons, teams, positions, search, version)
+    n_pages = max(1, -(-n_players // PAGE_SIZE))
+    page = st.number_input(
+        f"Page (of {n_pages}, {n_players} players)", 1, n_pages, value=1
+    )
+    df_page = get_players(seasons, teams, positions, search, page, version)
+    st.dataframe(df_page, hide_index=True)
+
+    # Keep earlier picks selectable while paging through the list
+    options = list(
+        dict.fromkeys(st.session_state.history_players + df_page["name"].tolist())
+    )
+    st.multiselect(
+        "Players", options, key="history_players", max_selections=MAX_PLAYERS
+    )
+
+    names = st.session_state.history_players
+    series = prefetch(
+        *(lambda name=name: get_player_series(name, seasons, version) for name in names)
+    )
+    for name, df_player in zip(names, series):
+        st.subheader(name)
+        st.plotly_chart(show_player_fig(df_player))
+
+
+def sidebar():
+    all_seasons, all_teams = get_filter_options(dbm.data_version())
+    with st.sidebar:
+        st.title("Filter the players")
+        seasons = st.select_slider(
+            "Seasons", all_seasons, value=(all_seasons[0], all_seasons[-1])
+        )
+        teams = st.multiselect("Teams", all_teams)
+        positions = st.multiselect("Positions", list(POSITION_STYLES))
+        search = st.text_input("Name contains")
+    return seasons, tuple(teams), tuple(positions), search
+
+
+if __name__ == "__main__":
+    st.set_page_config(
+        page_title="lionel - Player History",
+    )
+    with profile_page("Player_History"):
+        if "player_predictions" not in dbm.tables:
+            st.info("No player predictions have been loaded yet.")
+            st.stop()
+        initialise_session_vars()
+        main(*sidebar())
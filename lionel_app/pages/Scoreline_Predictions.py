@@ -1,8 +1,9 @@
-import pandas as pd
 import streamlit as st
-from About import NEXT_GW, dbm
-from plot_team import build_scoreline_plot
-from utils import setup_logger
+from About import dbm, get_next_gw
+from figure_cache import figure_cache
+from loaders import get_gameweek_outcomes, get_next_matches, scoreline_figure
+from profiling import profile_page
+from utils import prefetch, setup_logger
 
 logger = setup_logger(__name__)
 logger.debug("Running from top")  # just useful to undserstand the order of execution
@@ -15,39 +16,12 @@ def initialise_session_vars():
     if "away_team" not in st.session_state:
         st.session_state.away_team = "Tottenham"
     if "match" not in st.session_state:
-        st.session_state.match = get_next_matches()[2]
+        st.session_state.match = get_next_matches(get_next_gw(), dbm.data_version())[2]
 
 
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
-def get_df_scoreline():
-    return pd.DataFrame(dbm.query("SELECT * from scorelines").fetchall())
-
-
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
-def get_next_matches():
-    q = f"""
-    SELECT home.name as home, away.name as away
-    FROM fixtures
-    INNER JOIN teams as away
-    ON fixtures.home_id = away.id
-
-    INNER JOIN teams as home
-    ON fixtures.away_id = home.id
-
-    WHERE season = 25 AND gameweek = {NEXT_GW}
-    """
-    df = pd.DataFrame(dbm.query(q).fetchall())
-
-    matches = (df["home"] + " vs " + df["away"]).to_list()
-    print(matches)
-    return matches
-
-
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
-def get_teams():
-    return sorted(
-        [_[0] for _ in dbm.query("SELECT DISTINCT home from scorelines").fetchall()]
-    )
+@st.cache_data(max_entries=2, show_spinner="Pulling data...")
+def get_teams(version):
+    return sorted([_[0] for _ in dbm.query("SELECT DISTINCT home from scorelines")])
 
 
 def main():
@@ -80,26 +54,70 @@ def main():
         )
 
     # Not great to reload this on each run...
-    df_scoreline = get_df_scoreline()
     home_team, away_team = st.session_state.match.split(" vs ")
+    next_gw = get_next_gw()
+    version = dbm.data_version()
+    fig, df_outcomes = prefetch(
+        figure_cache.getter(*scoreline_figure(home_team, away_team, next_gw)),
+        lambda: get_gameweek_outcomes(next_gw, version),
+    )
     st.plotly_chart(
-        build_scoreline_plot(df_scoreline, home_team, away_team),
+        fig,
         # use_container_width=True,
         height=2000,
         width=2000,
     )
 
+    st.subheader(f"All Gameweek {next_gw} Fixtures")
+    percent = dict(format="percent")
+    st.dataframe(
+        df_outcomes,
+        hide_index=True,
+        column_order=[
+            "home",
+            "away",
+            "p_home_win",
+            "p_draw",
+            "p_away_win",
+            "p_home_clean_sheet",
+            "p_away_clean_sheet",
+            "xg_home",
+            "xg_away",
+        ],
+        column_config={
+            "home": "Home",
+            "away": "Away",
+            "p_home_win": st.column_config.NumberColumn("Home Win", **percent),
+            "p_draw": st.column_config.NumberColumn("Draw", **percent),
+            "p_away_win": st.column_config.NumberColumn("Away Win", **percent),
+            "p_home_clean_sheet": st.column_config.NumberColumn(
+                "Home Clean Sheet", **percent
+            ),
+            "p_away_clean_sheet": st.column_config.NumberColumn(
+                "Away Clean Sheet", **percent
+            ),
+            "xg_home": st.column_config.NumberColumn("Home xG", format="%.2f"),
+            "xg_away": st.column_config.NumberColumn("Away xG", format="%.2f"),
+        },
+    )
+
 
 def sidebar():
     with st.sidebar:
         st.title("Filter the forecasts")
-        st.selectbox("Match", get_next_matches(), key="match", index=0)
+        st.selectbox(
+            "Match",
+            get_next_matches(get_next_gw(), dbm.data_version()),
+            key="match",
+            index=0,
+        )
 
 
 if __name__ == "__main__":
     st.set_page_config(
         page_title="lionel - Scoreline Predictions",
     )
-    initialise_session_vars()
-    main()
-    sidebar()
+    with profile_page("Scoreline_Predictions"):
+        initialise_session_vars()
+        main()
+        sidebar()
@@ -1,9 +1,10 @@
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
-from About import NEXT_GW, dbm
-from plot_team import create_plot, create_value_plot
+from About import get_next_gw
+from figure_cache import figure_cache
+from loaders import selection_figure, value_figure
+from profiling import profile_page
 from utils import setup_logger
 
 # Config
@@ -11,38 +12,24 @@ logger = setup_logger(__name__)
 logger.debug("Running from top")  # just useful to undserstand the order of execution
 
 
-@st.cache_data(ttl=600, show_spinner="Pulling data...")
-def get_df_sel():
-    q = f"""
-    SELECT *
-    FROM selections
-    WHERE created_at = (
-        SELECT MAX(created_at)
-        FROM selections
-        WHERE gameweek = {NEXT_GW}
-    )
-    AND gameweek = {NEXT_GW};    
-    """
-    return pd.DataFrame(dbm.query(q).fetchall())
-
-
 def main():
     st.title("🦁 Team Selections")
-    df_sel = get_df_sel()
+    next_gw = get_next_gw()
 
     tab1, tab2 = st.tabs(["🤖 Team Selection", ":chart: Team Forecasts and Values"])
     with tab1:
-        st.subheader(f"Team Selections for Gameweek {NEXT_GW}")
-        st.plotly_chart(create_plot(df_sel))
+        st.subheader(f"Team Selections for Gameweek {next_gw}")
+        st.plotly_chart(figure_cache.get(*selection_figure(next_gw)))
 
     with tab2:
-        st.subheader(f"Team Forecasts and Values for Gameweek {NEXT_GW}")
-        st.plotly_chart(create_value_plot(df_sel))
+        st.subheader(f"Team Forecasts and Values for Gameweek {next_gw}")
+        st.plotly_chart(figure_cache.get(*value_figure(next_gw)))
 
 
 if __name__ == "__main__":
     st.set_page_config(
         page_title="lionel - Selections",
     )
-    # sidebar()
-    main()
+    with profile_page("Team_Selection"):
+        # sidebar()
+        main()
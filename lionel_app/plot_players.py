@@ -1,27 +1,28 @@
 import plotly.graph_objects as go
 import plotly.express as px
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from evaluation import ACTUAL, MODELS
+from plot_utils import compact_scattergl, use_webgl
+
+
+# Actual points, then each model's prediction
+PREDICTION_SERIES = [ACTUAL, *MODELS]
+
 
 def show_player_fig(data, names=[], teams=[], positions=[]):
-    df_1 = data.copy()
-    if names:
-        df_1 = df_1[df_1["name"].isin(names)]
-    if teams:
-        df_1 = df_1[df_1["team_name"].isin(teams)]
-    if positions:
-        df_1 = df_1[df_1["position"].isin(positions)]
+    # One mask for all the filters; the frame is only read, never copied
+    mask = np.ones(len(data), dtype=bool)
+    for col, values in (("name", names), ("team_name", teams), ("position", positions)):
+        if values:
+            mask &= data[col].isin(values).to_numpy()
+    df_1 = data if mask.all() else data[mask]
 
     l = []
     fig = go.Figure()
-    for pred_type in [
-        "y",
-        "y_Naive",
-        "y_LGBMRegressor_no_exog",
-        "y_LGBMRegressor_with_exog",
-        "y_LSTMWithReLU",
-    ]:
+    for pred_type in PREDICTION_SERIES:
         l.append(
             go.Scatter(
                 x=[df_1["season"], df_1["gameweek"]],
@@ -47,67 +48,53 @@ def show_player_fig(data, names=[], teams=[], positions=[]):
     return fig
 
 
+# position -> (legend name, marker colour), in legend order
+POSITION_STYLES = {
+    "GK": ("Goalkeepers", "#abb8f1"),
+    "DEF": ("Defenders", "#818cb6"),
+    "MID": ("Midfielders", "#58617b"),
+    "FWD": ("Forwards", "black"),
+}
+
+
 def build_player_inf_plot(df_players, min_minutes):
     # min_minutes=45
     df_plot = df_players[df_players["mean_minutes"] > min_minutes]
-    fig = go.Figure()
-    fig.add_trace(
-        go.Scatter(
-            x=df_plot[df_plot.position == "GK"]["assists"],
-            y=df_plot[df_plot.position == "GK"]["goals_scored"],
-            mode="markers",
-            marker=dict(color="#abb8f1"),
-            customdata=df_plot[df_plot.position == "GK"][
-                ["player_name", "position", "team_name", "mean_minutes"]
-            ],
-            hovertemplate="<b>%{customdata[0]}</b><br>Position: %{customdata[1]}<br>Team: %{customdata[2]}<br>Avg Minutes: %{customdata[3]}<br>Goals: %{y}<br>Assists: %{x}",
-            name="Goalkeepers",
-            showlegend=True,
-        )
-    )
-    fig.add_trace(
-        go.Scatter(
-            x=df_plot[df_plot.position == "DEF"]["assists"],
-            y=df_plot[df_plot.position == "DEF"]["goals_scored"],
-            mode="markers",
-            marker=dict(color="#818cb6"),
-            customdata=df_plot[df_plot.position == "DEF"][
-                ["player_name", "position", "team_name", "mean_minutes"]
-            ],
-            hovertemplate="<b>%{customdata[0]}</b><br>Position: %{customdata[1]}<br>Team: %{customdata[2]}<br>Avg Minutes: %{customdata[3]}<br>Goals: %{y}<br>Assists: %{x}",
-            name="Defenders",
-            showlegend=True,
-        )
-    )
-    fig.add_trace(
-        go.Scatter(
-            x=df_plot[df_plot.position == "MID"]["assists"],
-            y=df_plot[df_plot.position == "MID"]["goals_scored"],
-            mode="markers",
-            marker=dict(color="#58617b"),
-            customdata=df_plot[df_plot.position == "MID"][
-                ["player_name", "position", "team_name", "mean_minutes"]
-            ],
-            hovertemplate="<b>%{customdata[0]}</b><br>Position: %{customdata[1]}<br>Team: %{customdata[2]}<br>Avg Minutes: %{customdata[3]}<br>Goals: %{y}<br>Assists: %{x}",
-            name="Midfielders",
-            showlegend=True,
-        )
-    )
+    by_position = dict(tuple(df_plot.groupby("position", sort=False)))
 
-    fig.add_trace(
-        go.Scatter(
-            x=df_plot[df_plot.position == "FWD"]["assists"],
-            y=df_plot[df_plot.position == "FWD"]["goals_scored"],
-            mode="markers",
-            marker=dict(color="black"),
-            customdata=df_plot[df_plot.position == "FWD"][
-                ["player_name", "position", "team_name", "mean_minutes"]
-            ],
-            hovertemplate="<b>%{customdata[0]}</b><br>Position: %{customdata[1]}<br>Team: %{customdata[2]}<br>Avg Minutes: %{customdata[3]}<br>Goals: %{y}<br>Assists: %{x}",
-            name="Forwards",
-            showlegend=True,
+    fig = go.Figure()
+    webgl = use_webgl(len(df_plot))
+    for position, (name, colour) in POSITION_STYLES.items():
+        df_pos = by_position.get(position, df_plot.iloc[:0])
+        if webgl:
+            fig.add_traces(
+                compact_scattergl(
+                    df_pos,
+                    "assists",
+                    "goals_scored",
+                    split_by="team_name",
+                    customdata=["player_name", "mean_minutes"],
+                    hovertemplate=f"<b>%{{customdata[0]}}</b><br>Position: {position}<br>Team: {{split}}<br>Avg Minutes: %{{customdata[1]}}<br>Goals: %{{y}}<br>Assists: %{{x}}",
+                    mode="markers",
+                    marker=dict(color=colour),
+                    name=name,
+                )
+            )
+            continue
+        fig.add_trace(
+            go.Scatter(
+                x=df_pos["assists"],
+                y=df_pos["goals_scored"],
+                mode="markers",
+                marker=dict(color=colour),
+                customdata=df_pos[
+                    ["player_name", "position", "team_name", "mean_minutes"]
+                ],
+                hovertemplate="<b>%{customdata[0]}</b><br>Position: %{customdata[1]}<br>Team: %{customdata[2]}<br>Avg Minutes: %{customdata[3]}<br>Goals: %{y}<br>Assists: %{x}",
+                name=name,
+                showlegend=True,
+            )
         )
-    )
     fig.update_layout(
         # add horizontal legend
         legend_orientation="h",
@@ -117,3 +104,26 @@ def build_player_inf_plot(df_players, min_minutes):
         height=600,
     )
     return fig
+
+
+def build_model_metrics_plot(df_metrics, metric, title):
+    # df_metrics: one row per model, season and gameweek
+    fig = go.Figure()
+    for model, df_model in df_metrics.groupby("model", sort=False):
+        fig.add_trace(
+            go.Scatter(
+                x=[df_model["season"], df_model["gameweek"]],
+                y=df_model[metric],
+                mode="lines",
+                line=dict(width=2),
+                name=model,
+                customdata=df_model[["n"]],
+                hovertemplate=f"<b>{model}</b><br>{title}: %{{y:.2f}}<br>Players: %{{customdata[0]}}<extra></extra>",
+            )
+        )
+    fig.update_layout(
+        legend=dict(orientation="h", x=0, y=1.1),
+        xaxis_title="Season | Gameweek",
+        yaxis_title=title,
+    )
+    return fig
@@ -1,8 +1,14 @@
+import copy
+from functools import lru_cache
+
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from pathlib import Path
 
+from plot_utils import compact_scattergl, use_webgl
+from scorelines import GOAL_LABELS
+
 DATA = Path(__file__).parents[1] / "data"
 
 
@@ -82,6 +88,23 @@ def _create_pitch():
     return fig
 
 
+@lru_cache(maxsize=None)
+def _pitch_template():
+    # The static pitch, sized for create_plot, built and validated once per process
+    fig = _create_pitch()
+    fig.update_layout(
+        height=725,
+        width=500,
+        margin={"t": 10, "b": 0},
+    )
+    return fig.to_plotly_json()
+
+
+def _pitch_figure():
+    # A copy of the template is already valid, so skip plotly's (slow) validation
+    return go.Figure(copy.deepcopy(_pitch_template()), _validate=False)
+
+
 def _plot_players(first_xi, position, fig):
     df = first_xi.loc[first_xi.position == position]
 
@@ -103,7 +126,7 @@ def _plot_players(first_xi, position, fig):
             y=[Y[position]] * len(df),
             mode="markers+text",
             marker=dict(size=25, color="#4B5563"),
-            text=df["name"].str.split().str[-1],
+            text=df["last_name"],
             textposition="bottom center",
             textfont=dict(color="#4B5563"),
             textfont_size=10,
@@ -131,7 +154,7 @@ def _plot_subs(team, fig):
             y=Y,
             mode="markers",
             marker=dict(size=25, color="#4B5563"),
-            text=df["name"].str.split().str[-1],
+            text=df["last_name"],
             textposition="bottom left",
             textfont=dict(color="#4B5563"),
             textfont_size=10,
@@ -148,21 +171,14 @@ def _plot_subs(team, fig):
 def create_plot(players):
 
     # players = pd.read_csv(DATA / f"team_selection_{next_gw}_{season}.csv")
-    players["mean_points_pred"] = players["mean_points_pred"].round(1)
-    players["name"] = players["player"].str.split("_").str[1]
     team = players[players["xv"] == 1]
     first_xi = team.loc[team["xi"] == 1]
 
-    fig = _create_pitch()
+    fig = _pitch_figure()
     for pos in ["FWD", "MID", "DEF", "GK"]:
         _plot_players(first_xi, pos, fig)
 
     fig = _plot_subs(team, fig)
-    fig.update_layout(
-        height=725,
-        width=500,
-        margin={"t": 10, "b": 0},
-    )
 
     return fig
 
@@ -170,46 +186,63 @@ def create_plot(players):
 def create_value_plot(df_team):
     # df_team = pd.read_csv(DATA / f"team_selection_{next_gw}_{season}.csv")
     # df_team = pd.read_csv(DATA / f"team_selection_{next_gw}_{season}.csv")
-    df_team["name"] = df_team["player"].str.split("_").str[1]
-    df_team["mean_points_pred"] = df_team["mean_points_pred"].round(1)
     df_not_picked = df_team[df_team["xv"] == 0]
     df_picked = df_team[df_team["xv"] == 1]
 
     fig = go.Figure()
 
-    # Plot the unpicked players
-    fig.add_trace(
-        go.Scatter(
-            x=df_not_picked.value,
-            y=df_not_picked["mean_points_pred"],
-            marker=dict(
-                color="#9fbbe3",
-            ),
-            mode="markers",
-            customdata=df_not_picked[["name", "team_name", "mean_points_pred"]],
-            hovertemplate="<b>%{customdata[0]}</b>"
-            + "<br><br><b>Team:</b> %{customdata[1]}"
-            + "<br><b>Mean Predicted Points:</b> %{customdata[2]}"
-            + "<extra></extra>",
+    if use_webgl(len(df_team)):
+        # mean_points_pred is the y value, so only the name goes in customdata
+        for df_xv, colour in ((df_not_picked, "#9fbbe3"), (df_picked, "#4B5563")):
+            fig.add_traces(
+                compact_scattergl(
+                    df_xv,
+                    "value",
+                    "mean_points_pred",
+                    split_by="team_name",
+                    customdata=["name"],
+                    hovertemplate="<b>%{customdata[0]}</b>"
+                    + "<br><br><b>Team:</b> {split}"
+                    + "<br><b>Mean Predicted Points:</b> %{y}"
+                    + "<extra></extra>",
+                    marker=dict(color=colour),
+                    mode="markers",
+                )
+            )
+    else:
+        # Plot the unpicked players
+        fig.add_trace(
+            go.Scatter(
+                x=df_not_picked.value,
+                y=df_not_picked["mean_points_pred"],
+                marker=dict(
+                    color="#9fbbe3",
+                ),
+                mode="markers",
+                customdata=df_not_picked[["name", "team_name", "mean_points_pred"]],
+                hovertemplate="<b>%{customdata[0]}</b>"
+                + "<br><br><b>Team:</b> %{customdata[1]}"
+                + "<br><b>Mean Predicted Points:</b> %{customdata[2]}"
+                + "<extra></extra>",
+            )
         )
-    )
 
-    # Plot the picked players
-    fig.add_trace(
-        go.Scatter(
-            x=df_picked.value,
-            y=df_picked["mean_points_pred"],
-            marker=dict(
-                color="#4B5563",
-            ),
-            mode="markers",
-            customdata=df_picked[["name", "team_name", "mean_points_pred"]],
-            hovertemplate="<b>%{customdata[0]}</b>"
-            + "<br><br><b>Team:</b> %{customdata[1]}"
-            + "<br><b>Mean Predicted Points:</b> %{customdata[2]}"
-            + "<extra></extra>",
+        # Plot the picked players
+        fig.add_trace(
+            go.Scatter(
+                x=df_picked.value,
+                y=df_picked["mean_points_pred"],
+                marker=dict(
+                    color="#4B5563",
+                ),
+                mode="markers",
+                customdata=df_picked[["name", "team_name", "mean_points_pred"]],
+                hovertemplate="<b>%{customdata[0]}</b>"
+                + "<br><br><b>Team:</b> %{customdata[1]}"
+                + "<br><b>Mean Predicted Points:</b> %{customdata[2]}"
+                + "<extra></extra>",
+            )
         )
-    )
 
     fig.update_layout(
         autosize=False,
@@ -230,24 +263,16 @@ def create_value_plot(df_team):
     return fig
 
 
-def build_scoreline_plot(df_scoreline, home, away):
-    df_plot = df_scoreline[
-        (df_scoreline["home"] == home) & (df_scoreline["away"] == away)
-    ]
-
+def build_scoreline_plot(scoreline_matrix, home, away):
+    # scoreline_matrix is indexed [home_goals, away_goals]; heatmap rows are y (away)
     fig = go.Figure(
-        go.Histogram2d(
-            x=df_plot["home_goals"],
-            y=df_plot["away_goals"],
-            histnorm="probability",
-            autobinx=False,
-            xbins=dict(start=0, end=6, size=1),
-            autobiny=False,
-            ybins=dict(start=0, end=6, size=1),
+        go.Heatmap(
+            x=GOAL_LABELS,
+            y=GOAL_LABELS,
+            z=scoreline_matrix.T,
             colorscale=["white", "#4b5563"],
-            customdata=df_plot[["home", "away", "home_goals", "away_goals"]],
             name=f"{home} - {away} Scoreline Probability",
-            hovertemplate="Probability: %{z:.01%}",  # + "<br>Home Goals: %{customdata[2]} <br>Away Goals: %{customdata[3]}",
+            hovertemplate="Probability: %{z:.01%}",
         )
     )
     fig.update_layout(
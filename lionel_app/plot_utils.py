@@ -0,0 +1,36 @@
+import os
+
+import plotly.graph_objects as go
+
+# Scatter plots with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = int(os.environ.get("LIONEL_WEBGL_THRESHOLD", 1000))
+
+
+def use_webgl(n_points):
+    return n_points > WEBGL_THRESHOLD
+
+
+def compact_scattergl(df, x, y, split_by, customdata, hovertemplate, **kwargs):
+    """
+    WebGL traces for large scatter plots, one per value of `split_by`.
+
+    Rather than repeating a string like the team name in every point's
+    customdata, each trace has its value written into the hovertemplate in
+    place of "{split}". The traces share a legend entry.
+    """
+    traces = []
+    for i, (value, df_split) in enumerate(df.groupby(split_by, sort=False)):
+        traces.append(
+            go.Scattergl(
+                x=df_split[x],
+                y=df_split[y],
+                customdata=df_split[customdata],
+                hovertemplate=hovertemplate.replace("{split}", str(value)),
+                legendgroup=kwargs.get("name"),
+                showlegend=kwargs.get("showlegend", True) and i == 0,
+                **{k: v for k, v in kwargs.items() if k != "showlegend"},
+            )
+        )
+    if not traces:  # keep the legend entry
+        traces.append(go.Scattergl(x=[], y=[], **kwargs))
+    return traces
@@ -0,0 +1,136 @@
+"""
+Keep everything the pages read ready ahead of time.
+
+Watches the db for new model runs and, for each, writes the scoreline
+summaries, model metrics, Arrow snapshots and the pages' figures, so that no
+page request (or new replica) has to build them.
+
+    python lionel_app/precompute.py [--db data/lionel.db] [--interval 30] [--once]
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from evaluation import update_metrics
+from figure_cache import figure_cache
+from scorelines import backfill_summaries, season_draws_version
+from utils import get_gameweek, setup_logger
+
+logger = setup_logger(__name__)
+
+SEASON = 25
+# The Inference page's default minimum average minutes
+MIN_MINUTES = (45,)
+# What the pass reads; not what it writes, so its own writes don't start
+# another pass
+WATCHED_TABLES = ("teams", "fixtures", "scorelines", "player_predictions")
+
+
+def watched_state(dbm):
+    """
+    Changes when a new run is loaded: the runs registry, the versions of the
+    tables the pass reads, and the draws themselves, which may have been
+    loaded without DBManager (and so without counting them).
+    """
+    runs = []
+    if "runs" in dbm.tables:
+        runs = dbm.query(
+            "SELECT table_name, gameweek, created_at FROM runs ORDER BY 1, 2"
+        )
+    draws = None
+    if "scorelines" in dbm.tables:
+        draws = season_draws_version(dbm, SEASON)
+    return (
+        tuple(tuple(run) for run in runs),
+        dbm.data_version(*WATCHED_TABLES),
+        draws,
+    )
+
+
+def page_figures(dbm, loaders, gameweek):
+    """The figures the pages show by default for `gameweek`, by name."""
+    return {
+        "selection": loaders.selection_figure(gameweek),
+        "value": loaders.value_figure(gameweek),
+        "team_inference": loaders.team_inference_figure(),
+        **{
+            f"player_inference-{m}": loaders.player_inference_figure(m)
+            for m in MIN_MINUTES
+        },
+        **{
+            f"scoreline-{match}": loaders.scoreline_figure(
+                *match.split(" vs "), gameweek
+            )
+            for match in loaders.get_next_matches(gameweek, dbm.data_version())
+        },
+    }
+
+
+def publish_figures(dbm, loaders, gameweek):
+    """Publish the pages' figures for `gameweek`, and remove any others."""
+    published = set()
+    for figure in page_figures(dbm, loaders, gameweek).values():
+        try:
+            published.add(figure_cache.publish(*figure))
+        except Exception:
+            # e.g. a table with no runs yet; the page builds it if it can
+            logger.exception(f"Could not publish the {figure[0]} figure")
+
+    for path in Path(figure_cache.directory).glob("*.json"):
+        if path not in published:
+            path.unlink(missing_ok=True)
+    return published
+
+
+def precompute(dbm, loaders):
+    """Materialise everything the pages read for the db as it is now."""
+    # For tables created since startup
+    dbm.ensure_indexes()
+    dbm.ensure_runs()
+    gameweek = get_gameweek(dbm)
+    if "scorelines" in dbm.tables and backfill_summaries(dbm, SEASON, gameweek):
+        logger.info(f"Summarised the scorelines for gameweek {gameweek}")
+    if "player_predictions" in dbm.tables:
+        updated = update_metrics(dbm)
+        logger.info(f"Updated model metrics for {len(updated)} gameweeks")
+
+    snapshots = dbm.publish_snapshots()
+    figures = publish_figures(dbm, loaders, gameweek)
+    logger.info(f"Published {len(snapshots)} snapshots and {len(figures)} figures")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute the app's data and figures whenever a new run is loaded."
+    )
+    parser.add_argument("--db", help="path to lionel.db (default: the app's)")
+    parser.add_argument(
+        "--interval", type=float, default=30, help="seconds between checks"
+    )
+    parser.add_argument("--once", action="store_true", help="precompute once and exit")
+    args = parser.parse_args()
+
+    # About builds the DBManager the pages share on import, from LIONEL_DB
+    if args.db:
+        os.environ["LIONEL_DB"] = os.path.abspath(args.db)
+    import loaders
+    from About import dbm
+
+    state = None
+    while True:
+        # Taken before the pass, so a run loaded during it starts another
+        current = watched_state(dbm)
+        if current != state:
+            started = time.perf_counter()
+            precompute(dbm, loaders)
+            state = current
+            logger.info(f"Precomputed in {time.perf_counter() - started:.2f}s")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Upper bounds (ms) of the latency histogram's buckets
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, np.inf)
+
+# Set to a directory to dump a cProfile of every page rerun there
+PROFILE_DIR = os.environ.get("LIONEL_PROFILE_DIR")
+
+
+def _size(result):
+    """(rows, bytes) of a query's or loader's result, where they make sense."""
+    if hasattr(result, "memory_usage"):  # DataFrame or Series
+        return len(result), int(np.sum(result.memory_usage(index=False)))
+    if hasattr(result, "num_rows"):  # Arrow table
+        return result.num_rows, result.nbytes
+    if hasattr(result, "nbytes"):  # NumPy array
+        return len(result), result.nbytes
+    if isinstance(result, str):
+        return None, len(result)
+    if isinstance(result, (list, tuple)):
+        return len(result), None
+    return None, None
+
+
+class Timings:
+    """
+    Latency histograms, row counts and payload bytes per named operation,
+    for the whole process. Cheap enough to leave on: a lock and a few adds
+    per call.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=None, nbytes=None, error=False):
+        ms = seconds * 1000
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = self._stats[name] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "bytes": 0,
+                    "buckets": [0] * len(BUCKETS_MS),
+                }
+            stat["calls"] += 1
+            stat["errors"] += error
+            stat["total_ms"] += ms
+            stat["max_ms"] = max(stat["max_ms"], ms)
+            stat["rows"] += rows or 0
+            stat["bytes"] += nbytes or 0
+            stat["buckets"][np.searchsorted(BUCKETS_MS, ms)] += 1
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block. Set "rows"/"bytes" on the yielded dict to record them."""
+        sample = {"rows": None, "bytes": None}
+        start = time.perf_counter()
+        error = False
+        try:
+            yield sample
+        except Exception:  # not Streamlit's stop/rerun
+            error = True
+            raise
+        finally:
+            self.record(
+                name,
+                time.perf_counter() - start,
+                sample["rows"],
+                sample["bytes"],
+                error,
+            )
+
+    def timed(self, name=None):
+        """Decorator: time each call, and the size of what it returns."""
+
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(label) as sample:
+                    result = func(*args, **kwargs)
+                    sample["rows"], sample["bytes"] = _size(result)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def cached(self, cache, name):
+        """
+        Apply a st.cache_* decorator, timing every call as `name` and the
+        misses (the calls that actually ran) as `name (miss)`.
+        """
+
+        def decorator(func):
+            return self.timed(name)(cache(self.timed(f"{name} (miss)")(func)))
+
+        return decorator
+
+    def summary(self):
+        """One row per operation, with approximate percentiles from the histogram."""
+        with self._lock:
+            stats = {
+                name: dict(stat, buckets=list(stat["buckets"]))
+                for name, stat in self._stats.items()
+            }
+        rows = []
+        for name, stat in sorted(stats.items()):
+            cumulative = np.cumsum(stat["buckets"]) / stat["calls"]
+            p50, p95, p99 = (
+                BUCKETS_MS[np.searchsorted(cumulative, q)] for q in (0.5, 0.95, 0.99)
+            )
+            rows.append(
+                {
+                    "operation": name,
+                    "calls": stat["calls"],
+                    "errors": stat["errors"],
+                    "mean_ms": stat["total_ms"] / stat["calls"],
+                    "p50_ms": p50,
+                    "p95_ms": p95,
+                    "p99_ms": p99,
+                    "max_ms": stat["max_ms"],
+                    "rows": stat["rows"],
+                    "bytes": stat["bytes"],
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def histogram(self, name):
+        """Calls per latency bucket (upper bound, ms) for one operation."""
+        with self._lock:
+            buckets = list(self._stats[name]["buckets"])
+        return pd.Series(buckets, index=[str(b) for b in BUCKETS_MS], name=name)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+timings = Timings()
+timer = timings.timer
+timed = timings.timed
+cached = timings.cached
+
+# cProfile can only profile one rerun at a time
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profile_page(name):
+    """
+    Time a page rerun, and with LIONEL_PROFILE_DIR set dump its cProfile
+    (main thread only) to <dir>/<name>-<time>.prof.
+    """
+    profiler = None
+    if PROFILE_DIR and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with timer(f"page.{name}"):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            path = Path(PROFILE_DIR) / f"{name}-{time.time_ns()}.prof"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
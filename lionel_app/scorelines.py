@@ -0,0 +1,301 @@
+import numpy as np
+from sqlalchemy import text
+
+MAX_GOALS = 6  # the last row/column of a scoreline matrix is "6+"
+N_GOALS = MAX_GOALS + 1
+GOAL_LABELS = [str(g) for g in range(MAX_GOALS)] + [f"{MAX_GOALS}+"]
+
+# Posterior draws for a single fixture, as returned by DBManager.query_array
+DRAW_DTYPE = np.dtype(
+    [
+        ("home_goals", np.int8),
+        ("away_goals", np.int8),
+        ("chain", np.int16),
+        ("draw", np.int16),
+    ]
+)
+
+
+def _cells(home_goals, away_goals):
+    home = np.minimum(np.asarray(home_goals, dtype=np.intp), MAX_GOALS)
+    away = np.minimum(np.asarray(away_goals, dtype=np.intp), MAX_GOALS)
+    return home * N_GOALS + away
+
+
+def scoreline_matrix(home_goals, away_goals, weights=None):
+    """
+    Probability of each scoreline as a 7x7 matrix indexed [home_goals, away_goals].
+
+    `weights` lets pre-counted scorelines be passed in place of raw draws.
+    """
+    counts = np.bincount(
+        _cells(home_goals, away_goals), weights=weights, minlength=N_GOALS**2
+    ).astype(float)
+    total = counts.sum()
+    if total:
+        counts /= total
+    return counts.reshape(N_GOALS, N_GOALS)
+
+
+def joint_counts(df_scoreline, keys=("match", "home", "away")):
+    """
+    The number of draws of each scoreline per match: the sufficient statistics
+    for everything the app shows about a match. Goals aren't capped.
+    """
+    keys = list(keys)
+    group = df_scoreline.groupby(keys, sort=False).ngroup().to_numpy()
+    matches = df_scoreline[keys].drop_duplicates().reset_index(drop=True)
+    home = df_scoreline["home_goals"].to_numpy(dtype=np.intp)
+    away = df_scoreline["away_goals"].to_numpy(dtype=np.intp)
+    size = int(max(home.max(), away.max())) + 1
+
+    cells, n = np.unique((group * size + home) * size + away, return_counts=True)
+    group, cell = np.divmod(cells, size * size)
+
+    df = matches.loc[group].reset_index(drop=True)
+    df["home_goals"], df["away_goals"] = np.divmod(cell, size)
+    df["n"] = n
+    return df
+
+
+def outcome_probabilities(df_counts, keys=("match", "home", "away")):
+    """
+    Home win, draw and away win probabilities, each side's clean sheet
+    probability and expected goals per match from joint_counts.
+    """
+    keys = list(keys)
+    group = df_counts.groupby(keys, sort=False).ngroup().to_numpy()
+    df = df_counts[keys].drop_duplicates().reset_index(drop=True)
+    n = df_counts["n"].to_numpy(dtype=float)
+    home = df_counts["home_goals"].to_numpy()
+    away = df_counts["away_goals"].to_numpy()
+
+    total = np.bincount(group, weights=n)
+    df["n_draws"] = total.astype(int)
+    df["p_home_win"] = np.bincount(group, weights=n * (home > away)) / total
+    df["p_draw"] = np.bincount(group, weights=n * (home == away)) / total
+    df["p_away_win"] = np.bincount(group, weights=n * (home < away)) / total
+    df["p_home_clean_sheet"] = np.bincount(group, weights=n * (away == 0)) / total
+    df["p_away_clean_sheet"] = np.bincount(group, weights=n * (home == 0)) / total
+    df["xg_home"] = np.bincount(group, weights=n * home) / total
+    df["xg_away"] = np.bincount(group, weights=n * away) / total
+    return df
+
+
+def marginals(df_counts, side):
+    """P(goals) for one side ("home" or "away") of a single match's joint_counts."""
+    goals = df_counts.groupby(f"{side}_goals")["n"].sum()
+    return goals / goals.sum()
+
+
+# Summary storage: joint counts and outcomes per fixture replace the raw draws
+SUMMARY_TABLES = {
+    "scoreline_counts": """
+    CREATE TABLE IF NOT EXISTS scoreline_counts (
+        season INTEGER NOT NULL,
+        gameweek INTEGER NOT NULL,
+        match INTEGER,
+        home TEXT NOT NULL,
+        away TEXT NOT NULL,
+        home_goals INTEGER NOT NULL,
+        away_goals INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (season, gameweek, home, away, home_goals, away_goals)
+    )
+    """,
+    "scoreline_outcomes": """
+    CREATE TABLE IF NOT EXISTS scoreline_outcomes (
+        season INTEGER NOT NULL,
+        gameweek INTEGER NOT NULL,
+        match INTEGER,
+        home TEXT NOT NULL,
+        away TEXT NOT NULL,
+        n_draws INTEGER NOT NULL,
+        p_home_win REAL NOT NULL,
+        p_draw REAL NOT NULL,
+        p_away_win REAL NOT NULL,
+        p_home_clean_sheet REAL,
+        p_away_clean_sheet REAL,
+        xg_home REAL,
+        xg_away REAL,
+        PRIMARY KEY (season, gameweek, home, away)
+    )
+    """,
+    # The version of the season's draws each gameweek was summarised from
+    "scoreline_sources": """
+    CREATE TABLE IF NOT EXISTS scoreline_sources (
+        season INTEGER NOT NULL,
+        gameweek INTEGER NOT NULL,
+        draws_version TEXT NOT NULL,
+        PRIMARY KEY (season, gameweek)
+    )
+    """,
+}
+
+# Columns added to scoreline_outcomes since it was first created
+ADDED_OUTCOME_COLUMNS = [
+    "p_home_clean_sheet",
+    "p_away_clean_sheet",
+    "xg_home",
+    "xg_away",
+]
+
+
+def _ensure_summary_tables(dbm):
+    for ddl in SUMMARY_TABLES.values():
+        dbm.execute(ddl)
+    existing = {r[1] for r in dbm.query("PRAGMA table_info(scoreline_outcomes)")}
+    for column in ADDED_OUTCOME_COLUMNS:
+        if column not in existing:
+            dbm.execute(f"ALTER TABLE scoreline_outcomes ADD COLUMN {column} REAL")
+    dbm.ensure_runs()  # count the writes to scoreline_sources
+
+
+def _draws_version(conn, season):
+    # Changes when a season's draws are reloaded (new rowids) or edited in
+    # place (the checksum); one scan of the season's rows
+    row = conn.execute(
+        text(
+            """
+            SELECT COUNT(*), MAX(rowid),
+                SUM((rowid % 1000003) * (home_goals * 64 + away_goals + 1))
+            FROM scorelines
+            WHERE season = :season
+            """
+        ),
+        {"season": season},
+    ).one()
+    return ",".join(map(str, row))
+
+
+def season_draws_version(dbm, season):
+    """A version of the season's draws in `scorelines`, however they were loaded."""
+    with dbm.read_engine.connect() as conn:
+        return _draws_version(conn, season)
+
+
+def _record_source(conn, season, gameweek, draws_version):
+    conn.execute(
+        text(
+            """
+            INSERT OR REPLACE INTO scoreline_sources (season, gameweek, draws_version)
+            VALUES (:season, :gameweek, :draws_version)
+            """
+        ),
+        {"season": season, "gameweek": gameweek, "draws_version": draws_version},
+    )
+
+
+def _replace_summaries(dbm, conn, df_scoreline, season, gameweek, draws_version):
+    counts = joint_counts(df_scoreline)
+    outcomes = outcome_probabilities(counts)
+    for df in (counts, outcomes):
+        df.insert(0, "season", season)
+        df.insert(1, "gameweek", gameweek)
+    dbm.replace_rows("scoreline_counts", counts, season, gameweek, conn=conn)
+    dbm.replace_rows("scoreline_outcomes", outcomes, season, gameweek, conn=conn)
+    _record_source(conn, season, gameweek, draws_version)
+
+
+def store_scorelines(dbm, df_scoreline, season, gameweek, thin=None):
+    """
+    Load a model run's scoreline draws as their summary instead of every draw.
+
+    The joint counts and outcome probabilities for the gameweek are replaced,
+    along with the season's rows in `scorelines`, in one transaction. `thin`
+    keeps every `thin`-th draw of each chain in `scorelines` for diagnostics
+    (1 keeps them all); by default no draws are kept.
+    """
+    _ensure_summary_tables(dbm)
+
+    draws = df_scoreline.iloc[:0]
+    if thin:
+        draws = df_scoreline[df_scoreline["draw"] % thin == 0]
+
+    with dbm.engine.begin() as conn:
+        dbm.replace_rows("scorelines", draws.assign(season=season), season, conn=conn)
+        # Summarised from every draw, but recorded against the draws kept, so
+        # backfill_summaries leaves the summaries be until the draws change
+        _replace_summaries(
+            dbm, conn, df_scoreline, season, gameweek, _draws_version(conn, season)
+        )
+
+
+def _source(conn, season, gameweek):
+    # The version of the draws the gameweek was summarised from, if recorded
+    row = conn.execute(
+        text(
+            """
+            SELECT draws_version FROM scoreline_sources
+            WHERE season = :season AND gameweek = :gameweek
+            """
+        ),
+        {"season": season, "gameweek": gameweek},
+    ).first()
+    return row[0] if row else None
+
+
+def _thinned(conn, season, gameweek, draws_version):
+    # Stored before sources were recorded: summaries of more draws than
+    # `scorelines` has came from store_scorelines thinning them
+    n_summarised = conn.execute(
+        text(
+            """
+            SELECT COALESCE(SUM(n), 0) FROM scoreline_counts
+            WHERE season = :season AND gameweek = :gameweek
+            """
+        ),
+        {"season": season, "gameweek": gameweek},
+    ).scalar()
+    return n_summarised > int(draws_version.split(",")[0])
+
+
+def summaries_current(dbm, season, gameweek):
+    """
+    Whether the gameweek's summaries are of the season's draws in
+    `scorelines` (or of the run they were thinned from), so they can be read
+    in place of the draws.
+    """
+    if "scorelines" not in dbm.tables:
+        return True  # the summaries are all there is
+    with dbm.read_engine.connect() as conn:
+        draws_version = _draws_version(conn, season)
+        source = None
+        if "scoreline_sources" in dbm.tables:
+            source = _source(conn, season, gameweek)
+        if source is None:
+            return _thinned(conn, season, gameweek, draws_version)
+        return source == draws_version
+
+
+def backfill_summaries(dbm, season, gameweek):
+    """
+    Summarise the season's draws in `scorelines` for a gameweek, unless its
+    summaries are already of these draws: a run loaded (or re-run) as raw
+    draws rather than with store_scorelines. Returns whether it summarised them.
+    """
+    _ensure_summary_tables(dbm)
+    with dbm.read_engine.connect() as conn:
+        draws_version = _draws_version(conn, season)
+        source = _source(conn, season, gameweek)
+        thinned = source is None and _thinned(conn, season, gameweek, draws_version)
+    if source == draws_version:
+        return False
+    if thinned:
+        with dbm.engine.begin() as conn:
+            _record_source(conn, season, gameweek, draws_version)
+        return False
+
+    draws = dbm.query_df(
+        """
+        SELECT match, home, away, home_goals, away_goals
+        FROM scorelines
+        WHERE season = :season
+        """,
+        {"season": season},
+    )
+    if not len(draws):
+        return False
+    with dbm.engine.begin() as conn:
+        _replace_summaries(dbm, conn, draws, season, gameweek, draws_version)
+    return True
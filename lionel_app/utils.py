@@ -1,9 +1,18 @@
 import logging
-import pandas as pd
 import datetime as dt
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # from lionel_app import dbm
 
+# Connections kept in DBManager's read pool
+READ_POOL_SIZE = 5
+# Threads prefetch may run besides the pages' own, across every session: no
+# more than the read pool has connections for
+_prefetch_slots = threading.BoundedSemaphore(READ_POOL_SIZE)
+
 
 def setup_logger(name):
     logging.basicConfig()
@@ -12,20 +21,80 @@ def setup_logger(name):
     return logger
 
 
+# (db path, season) -> (next gameweek, datetime the answer expires)
+_gameweeks = {}
+
+
 def get_gameweek(dbm, season=25):
-    today = dt.datetime.today().date()
-    df = pd.DataFrame(
-        dbm.query(f"SELECT * FROM fixtures WHERE season = {season}").fetchall()
-    )
-    df = (
-        df.groupby("gameweek")
-        .agg(
-            first_kickoff=("kickoff_time", "min"), last_kickoff=("kickoff_time", "max")
-        )
-        .reset_index()
-    )
-    df[["first_kickoff", "last_kickoff"]] = df[["first_kickoff", "last_kickoff"]].apply(
-        pd.to_datetime
+    """
+    The next gameweek: one after the latest gameweek whose fixtures have all
+    been played. Memoised until the day after that next gameweek's last kickoff,
+    which is the earliest the answer can change.
+    """
+    key = (str(dbm.db_path), season)
+    now = dt.datetime.now()
+    if key in _gameweeks and now < _gameweeks[key][1]:
+        return _gameweeks[key][0]
+
+    q = """
+    WITH gameweeks AS (
+        SELECT gameweek, date(MAX(kickoff_time)) AS last_day
+        FROM fixtures
+        WHERE season = :season
+        GROUP BY gameweek
+    ),
+    next AS (
+        SELECT MAX(gameweek) + 1 AS gameweek
+        FROM gameweeks
+        WHERE last_day < date('now', 'localtime')
     )
-    next_gameweek = df[df.last_kickoff.dt.date < today].iloc[-1, 0] + 1
+    SELECT next.gameweek, date(gameweeks.last_day, '+1 day')
+    FROM next
+    LEFT JOIN gameweeks USING (gameweek)
+    """
+    next_gameweek, expires = dbm.query(q, {"season": season})[0]
+    if expires is None:  # end of season
+        expires = now + dt.timedelta(days=1)
+    else:
+        expires = dt.datetime.fromisoformat(expires)
+
+    _gameweeks[key] = (next_gameweek, expires)
     return next_gameweek
+
+
+def prefetch(*calls):
+    """
+    Run a page's independent loaders concurrently and return their results
+    in order, so a cold page waits for its slowest query rather than the sum.
+
+    Each call takes no arguments. Calls marked `cached` (see
+    FigureCache.getter) and the first of the rest run on the page's own
+    thread; the others get threads of their own, with the page's script
+    context (for st.cache_data), while the process has fewer than
+    READ_POOL_SIZE running. Past that they run on the page's thread too, so a
+    session never waits on another's loads. The first exception is re-raised.
+    """
+    slow = [i for i, call in enumerate(calls) if not getattr(call, "cached", False)]
+    threaded = []
+    for i in slow[1:]:
+        if not _prefetch_slots.acquire(blocking=False):
+            break
+        threaded.append(i)
+    if not threaded:
+        return [call() for call in calls]
+
+    ctx = get_script_run_ctx()
+
+    def run(call):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            return call()
+        finally:
+            _prefetch_slots.release()
+
+    with ThreadPoolExecutor(len(threaded), thread_name_prefix="prefetch") as pool:
+        futures = {i: pool.submit(run, calls[i]) for i in threaded}
+        return [
+            futures[i].result() if i in futures else call()
+            for i, call in enumerate(calls)
+        ]